@@ -0,0 +1,151 @@
+import os
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from pydantic import BaseModel
+
+from src.retriever.hybrid_retriever import query_hybrid_text
+from src.retriever.retriever_registry import warm_up, retriever_loaded
+from src.utils.batch_scheduler import scheduler_stats
+from src.utils.resource_cache import get_resource
+from src.utils.sql_result_cache import ResultCache
+from src.generator.llm_gateway import llm_stats
+
+# API_MODEL_WORKERS     threads running retrieval / CLIP (torch and faiss release the GIL,
+#                       and concurrent model calls are micro-batched, so threads share one copy of each model)
+# API_LLM_WORKERS       threads for blocking Gemini calls, kept apart so slow LLM calls can't starve retrieval
+# API_MAX_CONCURRENCY   requests per endpoint allowed in flight; the rest queue
+# API_QUEUE_TIMEOUT     seconds a request may queue before getting 503
+# API_REQUEST_TIMEOUT   seconds a request may run before getting 504
+MODEL_WORKERS = int(os.getenv("API_MODEL_WORKERS", str(os.cpu_count() or 4)))
+LLM_WORKERS = int(os.getenv("API_LLM_WORKERS", "16"))
+MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))
+QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "10"))
+REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "60"))
+
+model_pool = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix="model")
+llm_pool = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+limits = {}
+in_flight = {}
+
+
+class TextRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    filters: Optional[dict] = None
+
+
+class SQLRequest(BaseModel):
+    question: str
+
+
+def _limit(endpoint):
+    # Semaphores must be created inside the running event loop
+    if endpoint not in limits:
+        limits[endpoint] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return limits[endpoint]
+
+
+async def run_blocking(endpoint, pool, fn, *args):
+    """
+    Run a blocking call on `pool` without blocking the event loop, with a
+    per-endpoint concurrency cap, a queueing timeout (503) and a request
+    timeout (504).
+    """
+    limit = _limit(endpoint)
+    try:
+        await asyncio.wait_for(limit.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail=f"{endpoint} is busy, try again shortly")
+
+    in_flight[endpoint] = in_flight.get(endpoint, 0) + 1
+
+    def release(done):
+        # Runs when the worker thread is really finished, not when the client
+        # gave up, so MAX_CONCURRENCY bounds the work actually running
+        in_flight[endpoint] -= 1
+        limit.release()
+        if not done.cancelled():
+            done.exception()  # mark as retrieved after a 504
+
+    try:
+        future = asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BaseException:
+        in_flight[endpoint] -= 1
+        limit.release()
+        raise
+    future.add_done_callback(release)
+    try:
+        # shield: a timeout must not cancel the future (and fire release) early
+        return await asyncio.wait_for(asyncio.shield(future), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        # The worker thread finishes in the background and keeps its slot until then
+        raise HTTPException(status_code=504, detail=f"{endpoint} timed out after {REQUEST_TIMEOUT:.0f}s")
+
+
+def _ask_image(data, suffix):
+    # Imported lazily so the text-only path never loads CLIP / chromadb
+    from src.pipelines.image_ingest import query_image
+
+    # Written and removed on the worker thread, which also covers requests
+    # that time out while the query is still running
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+    try:
+        return query_image(tmp.name)
+    finally:
+        os.remove(tmp.name)
+
+
+def _ask_sql(question):
+    from src.pipelines.sql_pipeline import query_sql
+    return query_sql(question)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.getenv("RAG_WARMUP", "1") == "1":
+        warm_up(background=True)
+    yield
+    model_pool.shutdown(wait=False)
+    llm_pool.shutdown(wait=False)
+
+
+app = FastAPI(title="Capstone RAG API", lifespan=lifespan)
+
+
+@app.post("/ask-text")
+async def ask_text(request: TextRequest):
+    return await run_blocking("ask-text", model_pool, query_hybrid_text, request.query, request.top_k, request.filters)
+
+
+@app.post("/ask-image")
+async def ask_image(file: UploadFile = File(...)):
+    suffix = Path(file.filename or "").suffix or ".png"
+    return await run_blocking("ask-image", model_pool, _ask_image, await file.read(), suffix)
+
+
+@app.post("/ask-sql")
+async def ask_sql(request: SQLRequest):
+    return await run_blocking("ask-sql", llm_pool, _ask_sql, request.question)
+
+
+@app.get("/health")
+async def health():
+    return {
+        "retriever_loaded": retriever_loaded(),
+        "in_flight": dict(in_flight),
+        "batching": scheduler_stats(),
+        "sql_result_cache": get_resource("sql_result_cache", ResultCache).cache_stats(),
+        "llm": llm_stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", "8000")))
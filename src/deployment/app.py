@@ -1,24 +1,38 @@
 import os
-import json
 from datetime import datetime
 import sys
 from pathlib import Path
 import streamlit as st
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from memory.memory_store import MemoryStore
-from retriever.hybrid_retriever import query_hybrid_text
-from pipelines.image_ingest import query_image
-from pipelines.sql_pipeline import query_sql
+from src.utils.jsonl_log import get_logger
+
+# Set API_URL (e.g. http://localhost:8000) to send queries to the API
+# service in src/deployment/api.py; otherwise they run in this process
+API_URL = os.getenv("API_URL", "").rstrip("/")
+API_TIMEOUT = float(os.getenv("API_CLIENT_TIMEOUT", "120"))
 
 # -- Setup ---
 st.set_page_config(page_title="Capstone RAG System", layout="wide")
 st.title("📚 Capstone RAG System")
 memory = MemoryStore(max_len=5)
 
-LOG_FILE = "CHAT-LOGS.json"
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w") as f:
-        json.dump([], f, indent=2)
+if API_URL:
+    import requests
+else:
+    from retriever.hybrid_retriever import query_hybrid_text
+    from pipelines.image_ingest import query_image
+    from pipelines.sql_pipeline import query_sql
+    from src.retriever.retriever_registry import warm_up
+
+    # Load the text retriever once per process, in the background
+    if os.getenv("RAG_WARMUP", "1") == "1":
+        warm_up(background=True)
+
+# One JSON record per line, appended by a background thread
+# (read back with src/utils/jsonl_log.read_logs)
+LOG_FILE = "CHAT-LOGS.jsonl"
+chat_log = get_logger(LOG_FILE)
 
 # ----------------- Helper Functions -----------------
 def log_interaction(query, answer, confidence, mode):
@@ -29,11 +43,28 @@ def log_interaction(query, answer, confidence, mode):
         "answer": answer,
         "confidence": confidence
     }
-    with open(LOG_FILE, "r+") as f:
-        logs = json.load(f)
-        logs.append(log_entry)
-        f.seek(0)
-        json.dump(logs, f, indent=2)
+    chat_log.log(log_entry)
+
+def ask(endpoint, payload=None, file_path=None):
+    """POST to the API service; raises with the server's message on errors."""
+    if file_path:
+        with open(file_path, "rb") as f:
+            response = requests.post(f"{API_URL}/{endpoint}", files={"file": (os.path.basename(file_path), f)},
+                                     timeout=API_TIMEOUT)
+    else:
+        response = requests.post(f"{API_URL}/{endpoint}", json=payload, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        raise RuntimeError(f"{endpoint} failed ({response.status_code}): {response.text[:500]}")
+    return response.json()
+
+def ask_text(query):
+    return ask("ask-text", {"query": query}) if API_URL else query_hybrid_text(query)
+
+def ask_image(file_path):
+    return ask("ask-image", file_path=file_path) if API_URL else query_image(file_path)
+
+def ask_sql(question):
+    return ask("ask-sql", {"question": question}) if API_URL else query_sql(question)
 
 def refine_answer(answer, confidence, history):
     if confidence < 0.5:
@@ -52,7 +83,7 @@ if mode == "Text":
     if st.button("Submit"):
         if user_query.strip():
             memory.add_message("user", user_query)
-            res = query_hybrid_text(user_query)
+            res = ask_text(user_query)
             answer, confidence = refine_answer(res["answer"], res["confidence"], memory.get_history())
             memory.add_message("assistant", answer)
             st.markdown(f"**Answer (Confidence: {confidence:.2f})**:\n{answer}")
@@ -68,7 +99,7 @@ elif mode == "Image":
                 f.write(uploaded_file.getbuffer())
 
             memory.add_message("user", uploaded_file.name)
-            res = query_image(tmp_path)
+            res = ask_image(tmp_path)
             answer, confidence = refine_answer(res["answer"], res["confidence"], memory.get_history())
             memory.add_message("assistant", answer)
             st.markdown(f"**Answer (Confidence: {confidence:.2f})**:\n{answer}")
@@ -81,8 +112,21 @@ elif mode == "SQL":
     if st.button("Submit"):
         if user_query.strip():
             memory.add_message("user", user_query)
-            res = query_sql(user_query)
+            res = ask_sql(user_query)
             answer, confidence = refine_answer(res["answer"], res["confidence"], memory.get_history())
             memory.add_message("assistant", answer)
             st.markdown(f"**Answer (Confidence: {confidence:.2f})**:\n{answer}")
-            log_interaction(user_query, answer, confidence, mode)
\ No newline at end of file
+            log_interaction(user_query, answer, confidence, mode)
+            # Kept across reruns so paging doesn't re-run the query
+            st.session_state["sql_result"] = res
+
+    # Result rows, one page at a time
+    res = st.session_state.get("sql_result")
+    if res and res.get("rows"):
+        page_size = int(os.getenv("SQL_PAGE_SIZE", "25"))
+        n_pages = (len(res["rows"]) + page_size - 1) // page_size
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+        rows = res["rows"][(page - 1) * page_size:page * page_size]
+        st.dataframe([dict(zip(res["columns"], row)) for row in rows])
+        if res.get("truncated"):
+            st.caption(f"Showing the first {len(res['rows'])} rows of the result.")
\ No newline at end of file
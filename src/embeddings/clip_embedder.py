@@ -2,24 +2,54 @@ import torch
 import open_clip
 from PIL import Image
 
+from src.utils.inference_config import optimize_for_inference, inference_mode, model_tag
+from src.utils.batch_scheduler import BatchScheduler, MICRO_BATCH
+
 class CLIPEmbedder:
-    def __init__(self, device="cpu"):
+    def __init__(self, device="cpu", quantize=None, micro_batch=MICRO_BATCH):
         self.device = device
         self.model, _, self.preprocess = open_clip.create_model_and_transforms(
             "ViT-B-32", pretrained="openai"
         )
         self.model.to(self.device)
+        if self.device == "cpu":
+            self.model = optimize_for_inference(self.model, quantize)
+        else:
+            self.model.eval()
         self.tokenizer = open_clip.get_tokenizer("ViT-B-32")
 
+        # Single-image / single-text calls from concurrent requests share one forward pass
+        tag = model_tag("ViT-B-32", quantize)
+        self.image_scheduler = BatchScheduler(self.embed_images, name=f"clip-image:{tag}") if micro_batch else None
+        self.text_scheduler = BatchScheduler(self.embed_texts, name=f"clip-text:{tag}") if micro_batch else None
+
+    def embed_images(self, image_paths):
+        images = torch.stack([
+            self.preprocess(Image.open(path).convert("RGB")) for path in image_paths
+        ]).to(self.device)
+        with inference_mode():
+            image_features = self.model.encode_image(images)
+        return image_features.cpu().numpy()
+
+    def embed_texts(self, texts):
+        tokens = self.tokenizer(list(texts)).to(self.device)
+        with inference_mode():
+            text_features = self.model.encode_text(tokens)
+        return text_features.cpu().numpy()
+
+    def close(self):
+        """Stop the micro-batching threads (calls keep working, unbatched)."""
+        for scheduler in (self.image_scheduler, self.text_scheduler):
+            if scheduler is not None:
+                scheduler.close()
+        self.image_scheduler = self.text_scheduler = None
+
     def embed_image(self, image_path):
-        image = Image.open(image_path).convert("RGB")
-        image = self.preprocess(image).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            image_features = self.model.encode_image(image)
-        return image_features.cpu().numpy()[0]
+        if self.image_scheduler is not None:
+            return self.image_scheduler(image_path)
+        return self.embed_images([image_path])[0]
 
     def embed_text(self, text):
-        tokens = self.tokenizer([text]).to(self.device)
-        with torch.no_grad():
-            text_features = self.model.encode_text(tokens)
-        return text_features.cpu().numpy()[0]
\ No newline at end of file
+        if self.text_scheduler is not None:
+            return self.text_scheduler(text)
+        return self.embed_texts([text])[0]
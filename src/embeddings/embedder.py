@@ -1,11 +1,115 @@
+import os
+import threading
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from src.embeddings.embedding_cache import EmbeddingCache, LRUCache, EMBED_CACHE_PATH, text_hash
+from src.utils.inference_config import optimize_for_inference, inference_mode, model_tag, cpu_device_for
+from src.utils.batch_scheduler import BatchScheduler, concat_batch, MICRO_BATCH
+
+# Set EMBED_CACHE=0 to always run the model
+USE_EMBED_CACHE = os.getenv("EMBED_CACHE", "1") == "1"
+
+# Calls with at most this many texts are treated as queries and kept in the LRU;
+# bulk ingest calls only go to the disk cache so they don't evict hot queries
+QUERY_BATCH_MAX = 8
+
 
 class Embedder:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache_path=EMBED_CACHE_PATH,
+                 use_cache=USE_EMBED_CACHE, lru_size=2048, quantize=None, micro_batch=MICRO_BATCH):
+        # Cache entries are per precision: int8 vectors differ slightly from fp32
+        self.model_name = model_tag(model_name, quantize)
+        self.model = optimize_for_inference(SentenceTransformer(model_name, device=cpu_device_for(quantize)), quantize)
+
+        self.disk_cache = EmbeddingCache(cache_path) if use_cache else None
+        self.query_cache = LRUCache(lru_size) if use_cache else None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+        # Query-sized calls from concurrent requests share one model call
+        self.scheduler = BatchScheduler(self._embed_batch, name=f"embed:{self.model_name}") if micro_batch else None
+
+    def _encode(self, texts):
+        with inference_mode():
+            embeddings = self.model.encode(texts, show_progress_bar=len(texts) > 64)
+        return np.asarray(embeddings, dtype=np.float32)
 
     def embed(self, texts):
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        return np.array(embeddings)
+        texts = list(texts)
+        if self.scheduler is not None and 0 < len(texts) <= QUERY_BATCH_MAX:
+            # Repeated queries are answered from the LRU without queueing
+            if self.query_cache is not None:
+                cached = [self.query_cache.get(text_hash(text)) for text in texts]
+                if all(v is not None for v in cached):
+                    with self._stats_lock:
+                        self.stats["memory_hits"] += len(texts)
+                    return np.vstack(cached)
+            return self.scheduler(texts)
+        return self._embed_now(texts)
+
+    def _embed_batch(self, items):
+        return concat_batch(lambda texts: self._embed_now(texts, remember=True), items)
+
+    def _embed_now(self, texts, remember=None):
+        if self.disk_cache is None:
+            return self._encode(texts)
+
+        keys = [text_hash(text) for text in texts]
+        vectors = [None] * len(texts)
+        memory_hits = disk_hits = 0
+
+        # 1. In-memory LRU
+        for i, key in enumerate(keys):
+            vectors[i] = self.query_cache.get(key)
+            if vectors[i] is not None:
+                memory_hits += 1
+
+        # 2. Disk cache, one batched lookup
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            found = self.disk_cache.get_many(self.model_name, [keys[i] for i in missing])
+            for i in missing:
+                vectors[i] = found.get(keys[i])
+                if vectors[i] is not None:
+                    disk_hits += 1
+
+        # 3. Encode what's left (duplicates once) and fill the disk cache
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            text_by_key = {keys[i]: texts[i] for i in missing}
+            encoded = self._encode([text_by_key[key] for key in unique])
+            self.disk_cache.put_many(self.model_name, unique, encoded)
+            by_key = dict(zip(unique, encoded))
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+
+        if remember is None:
+            remember = len(texts) <= QUERY_BATCH_MAX
+        if remember:
+            for key, vector in zip(keys, vectors):
+                self.query_cache.put(key, vector)
+
+        with self._stats_lock:
+            self.stats["memory_hits"] += memory_hits
+            self.stats["disk_hits"] += disk_hits
+            self.stats["misses"] += len(missing)
+
+        if not vectors:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def close(self):
+        """Stop the micro-batching thread (embed() keeps working, unbatched)."""
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+
+    def cache_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / total if total else 0.0
+        return stats
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+EMBED_CACHE_PATH = "src/data/embeddings/embed_cache.db"
+
+# Stay under SQLite's bound-parameter limit
+MAX_PARAMS = 900
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class LRUCache:
+    """Small thread-safe in-memory LRU of key -> vector (for repeated queries)."""
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    Disk cache of embeddings keyed by (model name, sha1 of text).
+    Lookups and fills are batched; one SQLite connection per thread.
+    """
+    def __init__(self, db_path=EMBED_CACHE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model, hashes):
+        """{hash: vector} for the hashes that are cached."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), MAX_PARAMS):
+            batch = unique[start:start + MAX_PARAMS]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self._conn().execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                [model, *batch]
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, hashes, vectors):
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+            [
+                (model, key, np.asarray(vector, dtype=np.float32).tobytes())
+                for key, vector in zip(hashes, vectors)
+            ]
+        )
+        conn.commit()
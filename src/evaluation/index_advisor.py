@@ -0,0 +1,344 @@
+import os
+import re
+import sys
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.pipelines.sql_pipeline import DB_PATH, QUERY_LOG
+from src.utils.jsonl_log import read_logs
+from src.utils.schema_loader import get_schema_info
+
+# Query shapes seen fewer times than this are ignored
+MIN_COUNT = 2
+# Timed runs per query when benchmarking (the median is kept)
+BENCH_REPEATS = 5
+# An index holding every column a query touches (up to this many) answers it without reading the table
+COVERING_MAX_COLUMNS = 5
+# Proposals must save at least this fraction of the affected queries' time
+MIN_SAVING = 0.10
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
+CLAUSE_RE = re.compile(r"\b(where|group by|having|order by|limit)\b")
+TABLE_RE = re.compile(r'\b(?:from|join)\s+(["`\[]?\w+["`\]]?)(?:\s+(?:as\s+)?(\w+))?')
+NOT_ALIASES = {"where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+               "group", "order", "limit", "having", "union", "except", "intersect"}
+SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+AUTO_INDEX_RE = re.compile(r"^SEARCH (\w+)(?: AS \w+)? USING AUTOMATIC (?:COVERING )?INDEX \((.*)\)")
+TEMP_BTREE_RE = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?(ORDER BY|GROUP BY|DISTINCT)")
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ---- reading the query log ----
+def load_workload(log_path=QUERY_LOG, db_path=DB_PATH, since=None):
+    """
+    Recorded queries grouped by canonical SQL:
+    {canonical: {"sql", "plan", "count", "ms": [..]}} (latest plan and SQL kept).
+    """
+    workload = {}
+    for record in read_logs(log_path, since=since):
+        if os.path.abspath(record.get("db", db_path)) != os.path.abspath(db_path):
+            continue
+        shape = workload.setdefault(record["canonical"], {"count": 0, "ms": []})
+        shape["sql"] = record["sql"]
+        shape["plan"] = record["plan"]
+        shape["count"] += 1
+        shape["ms"].append(record["ms"])
+    return workload
+
+
+# ---- reading a query ----
+def _clauses(sql):
+    """{"select", "from", "where", "group by", ...} text of the top of the query."""
+    text = STRING_RE.sub("?", sql.lower())
+    text = NUMBER_RE.sub("?", text)
+    parts = {}
+    marks = [(m.start(), m.group(1)) for m in CLAUSE_RE.finditer(text)]
+    head_end = marks[0][0] if marks else len(text)
+    head = text[:head_end]
+    from_at = head.find(" from ")
+    parts["select"] = head[:from_at] if from_at >= 0 else head
+    parts["from"] = head[from_at:] if from_at >= 0 else ""
+    for i, (start, name) in enumerate(marks):
+        end = marks[i + 1][0] if i + 1 < len(marks) else len(text)
+        parts[name] = text[start + len(name):end]
+    return parts
+
+
+def _tables(from_text, known):
+    """alias -> table for the tables named in the FROM / JOIN part."""
+    aliases = {}
+    for name, alias in TABLE_RE.findall(from_text):
+        name = name.strip('"`[]')
+        table = next((t for t in known if t.lower() == name), None)
+        if table is None:
+            continue
+        aliases[table.lower()] = table
+        if alias and alias not in NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _column_re(column):
+    name = re.escape(column.lower())
+    return rf'(?<![\w.])(?:\w+\.)?(?:"{name}"|`{name}`|\[{name}\]|{name})(?!\w)'
+
+
+def _mentioned(text, columns):
+    """Columns found in the text, in order of first appearance."""
+    found = []
+    for col in columns:
+        match = re.search(_column_re(col), text)
+        if match:
+            found.append((match.start(), col))
+    return [col for _, col in sorted(found)]
+
+
+def _filters(where, columns):
+    """(equality columns, range columns) of a WHERE clause."""
+    equality, ranges = [], []
+    for col in _mentioned(where, columns):
+        after = rf"{_column_re(col)}\s*(==|=|\bin\b|\bis\b(?!\s+not)|<=|>=|<>|!=|<|>|\bbetween\b|\blike\b|\bglob\b)"
+        for op in re.findall(after, where):
+            if op in ("=", "==", "in", "is"):
+                equality.append(col)
+                break
+        else:
+            if re.search(after, where):
+                ranges.append(col)
+    return equality, ranges
+
+
+def _selects_all(select_text):
+    return re.search(r"(^|,|select|distinct)\s*(\w+\.)?\*\s*(,|$)", select_text.strip()) is not None
+
+
+def candidate_for(sql, plan, tables_info):
+    """
+    (table, columns, reason) for a query whose plan scans a table or builds
+    a temp B-tree, or None. Columns: equality filters first, then the
+    GROUP BY / ORDER BY columns (or one range filter), so the index both
+    narrows the rows and returns them in the order needed; extended to a
+    covering index when the query touches only a few columns.
+    """
+    parts = _clauses(sql)
+    aliases = _tables(parts["from"], tables_info)
+    if not aliases:
+        return None
+    # Temp B-tree lines don't name a table; they belong to the driving (first) one
+    first_table = next(iter(aliases.values()))
+
+    target, reasons, auto_columns = None, [], []
+    for line in plan:
+        scan = SCAN_RE.match(line)
+        auto = AUTO_INDEX_RE.match(line)
+        temp = TEMP_BTREE_RE.search(line)
+        if scan and scan.group(1).lower() in aliases and target is None:
+            target = aliases[scan.group(1).lower()]
+            reasons.append(f"full scan of {target}")
+        elif auto and auto.group(1).lower() in aliases:
+            target = target or aliases[auto.group(1).lower()]
+            auto_columns = [c.split("=")[0].strip() for c in auto.group(2).split(" AND ")]
+            reasons.append(f"automatic index on {aliases[auto.group(1).lower()]}")
+        elif temp:
+            target = target or first_table
+            reasons.append(f"temp B-tree for {temp.group(1)}")
+    if target is None:
+        return None
+
+    columns = [col["name"] for col in tables_info[target]]
+    equality, ranges = _filters(parts.get("where", ""), columns)
+    wanted = equality + [c for c in auto_columns if c in columns]
+    if "group by" in parts:
+        wanted += _mentioned(parts["group by"], columns)
+    elif "order by" in parts and not re.search(r"\bdesc\b", parts["order by"]):
+        wanted += _mentioned(parts["order by"], columns)
+    elif ranges:
+        wanted.append(ranges[0])
+    wanted = list(dict.fromkeys(wanted))
+    if not wanted:
+        return None
+
+    touched = _mentioned(" ".join(parts.values()), columns)
+    if not _selects_all(parts["select"]) and len(set(touched) | set(wanted)) <= COVERING_MAX_COLUMNS:
+        wanted += [c for c in touched if c not in wanted]
+    return target, tuple(wanted), ", ".join(reasons)
+
+
+def existing_indexes(conn, table):
+    """Column tuples of the table's current indexes."""
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list({_quote(table)})").fetchall():
+        info = conn.execute(f"PRAGMA index_info({_quote(row[1])})").fetchall()
+        indexes.append(tuple(r[2] for r in sorted(info)))
+    return indexes
+
+
+def index_name(table, columns):
+    name = "_".join(re.sub(r"[^0-9a-zA-Z]+", "_", c).lower() for c in columns)
+    return f"idx_{table}_{name}"[:60]
+
+
+def propose(workload, db_path=DB_PATH, min_count=MIN_COUNT):
+    """{(table, columns): {"queries": [canonical], "reasons": set}} for recurring problem queries."""
+    tables_info = get_schema_info(db_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        current = {table: existing_indexes(conn, table) for table in tables_info}
+    finally:
+        conn.close()
+
+    proposals = defaultdict(lambda: {"queries": [], "reasons": set()})
+    for canonical, shape in workload.items():
+        if shape["count"] < min_count:
+            continue
+        found = candidate_for(shape["sql"], shape["plan"], tables_info)
+        if found is None:
+            continue
+        table, columns, reason = found
+        # An existing index with the same leading columns already covers it
+        if any(index[:len(columns)] == columns for index in current[table]):
+            continue
+        proposals[(table, columns)]["queries"].append(canonical)
+        proposals[(table, columns)]["reasons"].add(reason)
+    return proposals
+
+
+# ---- measuring ----
+def bench(conn, sql, repeats=BENCH_REPEATS):
+    """Median wall time (ms) of running the query to completion."""
+    conn.execute(sql).fetchall()  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def plan_of(conn, sql):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()]
+
+
+def estimate(proposals, workload, db_path=DB_PATH, repeats=BENCH_REPEATS):
+    """
+    Try each proposed index on a scratch copy of the database: time the
+    affected queries without and with it. Estimated savings = recorded
+    executions x (before - after), i.e. what the logged workload would
+    have saved.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix="index_advisor_")
+    scratch = os.path.join(scratch_dir, "copy.db")
+    results = []
+    try:
+        source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        conn = sqlite3.connect(scratch, isolation_level=None)
+        source.backup(conn)
+        source.close()
+
+        for (table, columns), proposal in proposals.items():
+            name = index_name(table, columns)
+            before = {q: bench(conn, workload[q]["sql"], repeats) for q in proposal["queries"]}
+
+            start = time.perf_counter()
+            conn.execute(f"CREATE INDEX {_quote(name)} ON {_quote(table)} ({', '.join(map(_quote, columns))})")
+            conn.execute(f"ANALYZE {_quote(name)}")
+            build_ms = (time.perf_counter() - start) * 1000
+            used = {q: any(name in line for line in plan_of(conn, workload[q]["sql"])) for q in proposal["queries"]}
+            after = {q: bench(conn, workload[q]["sql"], repeats) for q in proposal["queries"]}
+            conn.execute(f"DROP INDEX {_quote(name)}")
+
+            saved = sum(workload[q]["count"] * (before[q] - after[q]) for q in proposal["queries"])
+            spent = sum(workload[q]["count"] * before[q] for q in proposal["queries"])
+            results.append({
+                "name": name, "table": table, "columns": columns,
+                "reasons": sorted(proposal["reasons"]),
+                "queries": len(proposal["queries"]),
+                "executions": sum(workload[q]["count"] for q in proposal["queries"]),
+                "before_ms": sum(before.values()), "after_ms": sum(after.values()),
+                "saved_ms": saved, "saved_fraction": saved / spent if spent else 0.0,
+                "used": all(used.values()), "build_ms": build_ms,
+            })
+        conn.close()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    results.sort(key=lambda r: r["saved_ms"], reverse=True)
+    return results
+
+
+def recommended(results, min_saving=MIN_SAVING):
+    return [r for r in results if r["used"] and r["saved_fraction"] >= min_saving]
+
+
+def bench_workload(db_path, workload, repeats=BENCH_REPEATS):
+    """Recorded workload replayed once: total ms weighted by how often each query ran."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return sum(shape["count"] * bench(conn, shape["sql"], repeats) for shape in workload.values())
+    finally:
+        conn.close()
+
+
+def apply(results, workload, db_path=DB_PATH, repeats=BENCH_REPEATS):
+    """Create the indexes on the real database, ANALYZE, and re-benchmark the workload."""
+    before = bench_workload(db_path, workload, repeats)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for r in results:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(r['name'])} "
+                         f"ON {_quote(r['table'])} ({', '.join(map(_quote, r['columns']))})")
+            print(f"Created {r['name']}")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    after = bench_workload(db_path, workload, repeats)
+    return before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suggest indexes from the recorded SQL-QA queries.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--log", default=QUERY_LOG)
+    parser.add_argument("--since", help="only records from this ISO timestamp on")
+    parser.add_argument("--min-count", type=int, default=MIN_COUNT)
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes and re-benchmark")
+    args = parser.parse_args(argv)
+
+    workload = load_workload(args.log, args.db, args.since)
+    total = sum(shape["count"] for shape in workload.values())
+    print(f"{total} recorded queries, {len(workload)} distinct")
+    proposals = propose(workload, args.db, args.min_count)
+    if not proposals:
+        print("No recurring full scans or temp B-trees without a matching index.")
+        return []
+
+    results = estimate(proposals, workload, args.db)
+    print(f"\n{'index':<40} {'queries':>7} {'runs':>5} {'before ms':>10} {'after ms':>9} {'saved ms':>9}  reason")
+    for r in results:
+        flag = "" if r["used"] else "  (not used by the planner)"
+        print(f"{r['name']:<40} {r['queries']:>7} {r['executions']:>5} {r['before_ms']:>10.2f} "
+              f"{r['after_ms']:>9.2f} {r['saved_ms']:>9.1f}  {'; '.join(r['reasons'])}{flag}")
+        print(f"    CREATE INDEX {r['name']} ON {_quote(r['table'])} ({', '.join(map(_quote, r['columns']))});")
+
+    chosen = recommended(results)
+    print(f"\n{len(chosen)} of {len(results)} indexes recommended")
+    if args.apply and chosen:
+        before, after = apply(chosen, workload, args.db)
+        print(f"Recorded workload: {before:.1f} ms before, {after:.1f} ms after "
+              f"({(1 - after / before) * 100 if before else 0:.0f}% faster)")
+    return chosen
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.embeddings.embedder import Embedder
+from src.embeddings.clip_embedder import CLIPEmbedder
+from src.retriever.reranker import Reranker
+
+IMAGE_DIR = "src/data/raw/images"
+
+sample_queries = [
+    "Explain executive compensation structure in the documents.",
+    "Who are the named executive officers?",
+    "What was the total shareholder return in 2022?",
+    "Describe the board's role in risk oversight.",
+]
+
+sample_passages = [
+    "The compensation committee approved base salary increases for the named executive officers.",
+    "Our board oversees risk management through its audit and compensation committees.",
+    "Total shareholder return is measured against a peer group over a three-year period.",
+    "The annual meeting will be held virtually; stockholders may vote online.",
+    "Performance-based restricted stock units vest subject to relative TSR goals.",
+    "The audit committee reviews the independence of the registered public accounting firm.",
+]
+
+
+def _cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def _timed(fn, repeats=5):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats * 1000
+
+
+def check_embedder():
+    texts = sample_queries + sample_passages
+    fp32 = Embedder(use_cache=False, quantize="none")
+    int8 = Embedder(use_cache=False, quantize="int8")
+    ref, ref_ms = _timed(lambda: fp32.embed(texts))
+    out, out_ms = _timed(lambda: int8.embed(texts))
+    cos = _cosine(ref, out)
+    return {"model": "MiniLM embedder", "metric": "min cosine", "value": float(cos.min()),
+            "fp32_ms": ref_ms, "int8_ms": out_ms}
+
+
+def check_reranker():
+    candidates = [{"text": t} for t in sample_passages]
+    fp32 = Reranker(quantize="none")
+    int8 = Reranker(quantize="int8")
+
+    agreement = []
+    ref_ms = out_ms = 0.0
+    for query in sample_queries:
+        ref, t_ref = _timed(lambda: np.asarray(fp32.score(query, candidates)))
+        out, t_out = _timed(lambda: np.asarray(int8.score(query, candidates)))
+        ref_ms += t_ref
+        out_ms += t_out
+        # What matters for reranking is the order, so compare the top-3 sets
+        agreement.append(len(set(np.argsort(-ref)[:3]) & set(np.argsort(-out)[:3])) / 3)
+
+    return {"model": "CrossEncoder", "metric": "top-3 overlap", "value": float(np.mean(agreement)),
+            "fp32_ms": ref_ms / len(sample_queries), "int8_ms": out_ms / len(sample_queries)}
+
+
+def check_clip():
+    fp32 = CLIPEmbedder(quantize="none")
+    int8 = CLIPEmbedder(quantize="int8")
+
+    images = sorted(p for p in Path(IMAGE_DIR).glob("*") if p.suffix.lower() in {".png", ".jpg", ".jpeg"})[:5]
+    if images:
+        ref, ref_ms = _timed(lambda: np.stack([fp32.embed_image(p) for p in images]))
+        out, out_ms = _timed(lambda: np.stack([int8.embed_image(p) for p in images]))
+    else:
+        ref, ref_ms = _timed(lambda: np.stack([fp32.embed_text(q) for q in sample_queries]))
+        out, out_ms = _timed(lambda: np.stack([int8.embed_text(q) for q in sample_queries]))
+
+    return {"model": "CLIP", "metric": "min cosine", "value": float(_cosine(ref, out).min()),
+            "fp32_ms": ref_ms, "int8_ms": out_ms}
+
+
+def check_blip():
+    from PIL import Image
+    from src.pipelines.image_ingest import _load_blip
+    from src.utils.inference_config import inference_mode
+
+    images = sorted(p for p in Path(IMAGE_DIR).glob("*") if p.suffix.lower() in {".png", ".jpg", ".jpeg"})[:3]
+    if not images:
+        print(f"No images in {IMAGE_DIR}; skipping BLIP.")
+        return None
+
+    def captions(processor, model):
+        out = []
+        for path in images:
+            inputs = processor(Image.open(path).convert("RGB"), return_tensors="pt")
+            with inference_mode():
+                ids = model.generate(**inputs, max_new_tokens=50)
+            out.append(processor.decode(ids[0], skip_special_tokens=True))
+        return out
+
+    processor, fp32 = _load_blip(quantize="none")
+    _, int8 = _load_blip(quantize="int8")
+    ref, ref_ms = _timed(lambda: captions(processor, fp32), repeats=1)
+    out, out_ms = _timed(lambda: captions(processor, int8), repeats=1)
+
+    # Token overlap between fp32 and int8 captions
+    overlap = [len(set(a.split()) & set(b.split())) / max(len(set(a.split())), 1) for a, b in zip(ref, out)]
+    return {"model": "BLIP", "metric": "caption word overlap", "value": float(np.mean(overlap)),
+            "fp32_ms": ref_ms, "int8_ms": out_ms}
+
+
+def run_checks():
+    results = []
+    for check in (check_embedder, check_reranker, check_clip, check_blip):
+        print(f"Running {check.__name__}...")
+        result = check()
+        if result:
+            results.append(result)
+
+    print(f"\n{'model':<16} {'metric':<22} {'value':>7} {'fp32 ms':>9} {'int8 ms':>9} {'speedup':>8}")
+    for r in results:
+        speedup = r["fp32_ms"] / r["int8_ms"] if r["int8_ms"] else 0.0
+        print(f"{r['model']:<16} {r['metric']:<22} {r['value']:>7.3f} "
+              f"{r['fp32_ms']:>9.1f} {r['int8_ms']:>9.1f} {speedup:>7.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    run_checks()
@@ -1,14 +1,13 @@
 import os
-import json
-from retriever.hybrid_retriever import query_hybrid_text
+import uuid
+from datetime import datetime
+from retriever.hybrid_retriever import query_hybrid_text_many
 from pipelines.image_ingest import query_image
 from pipelines.sql_pipeline import query_sql
+from utils.jsonl_log import JsonlLogger
 
-LOG_FILE = "EVAL-LOGS.json"
-
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w") as f:
-        json.dump([], f, indent=2)
+# Every run appends its results, tagged with run_id (see utils/jsonl_log.read_logs)
+LOG_FILE = "EVAL-LOGS.jsonl"
 
 test_cases = [
     {
@@ -27,6 +26,12 @@ test_cases = [
 
 def run_tests():
     results = []
+    run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    eval_log = JsonlLogger(LOG_FILE)
+
+    # All text queries go through the retriever as one batch
+    text_queries = [case["query"] for case in test_cases if case["mode"] == "Text"]
+    text_answers = dict(zip(text_queries, query_hybrid_text_many(text_queries))) if text_queries else {}
 
     for case in test_cases:
         mode = case["mode"]
@@ -35,7 +40,7 @@ def run_tests():
         print(f"Query: {query}")
 
         if mode == "Text":
-            res = query_hybrid_text(query)
+            res = text_answers[query]
         elif mode == "Image":
             if not os.path.exists(query):
                 print(f"Image not found: {query}")
@@ -49,18 +54,19 @@ def run_tests():
         print(f"Answer: {res['answer'][:500]}...")
         print(f"Confidence: {res['confidence']:.2f}")
 
-        results.append({
+        result = {
+            "run_id": run_id,
             "mode": mode,
             "query": query,
             "answer": res["answer"],
             "confidence": res["confidence"]
-        })
-
-    # Save evaluation logs
-    with open(LOG_FILE, "w") as f:
-        json.dump(results, f, indent=2)
+        }
+        results.append(result)
+        eval_log.log(result)
 
-    print("\n Evaluation complete. Results saved to EVAL-LOGS.json")
+    eval_log.close()
+    print(f"\n Evaluation complete. Results appended to {LOG_FILE} (run {run_id})")
+    return results
 
 if __name__ == "__main__":
     run_tests()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+QUESTIONS = [
+    "How many customers are there in total?",
+    "List customers from Chile",
+    "Show customers who subscribed in 2021",
+    "How many customers work at companies with Group in the name?",
+    "Which cities have the most customers?",
+    "Show the first 10 customers by last name",
+]
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the SQL-QA path against the local LLM stub.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=800, help="injected LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=400, help="extra latency, fixed per prompt")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM attempts failing with 503")
+    parser.add_argument("--no-cache", action="store_true", help="disable the plan and result caches")
+    parser.add_argument("--answer-mode", choices=["llm", "template"], help="override SQL_ANSWER_MODE")
+    parser.add_argument("--real-llm", action="store_true", help="use the configured backend instead of the stub")
+    args = parser.parse_args(argv)
+
+    if args.no_cache:
+        os.environ["SQL_PLAN_CACHE"] = "0"
+        os.environ["SQL_RESULT_CACHE"] = "0"
+    if not args.real_llm:
+        # Stub SQL must not end up in the query log the index advisor reads
+        os.environ["SQL_QUERY_LOG"] = "0"
+    # Imported after these switches are set, since they are read at import time
+    from src.pipelines.sql_pipeline import query_sql
+    from src.generator.llm_gateway import LLMGateway, StubBackend, llm_stats
+    from src.generator.sql_plan_cache import SQLPlanCache
+    from src.utils.resource_cache import get_resource
+
+    plan_cache = None
+    if not args.real_llm:
+        stub = StubBackend(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+        get_resource("llm_gateway", lambda: LLMGateway(backend=stub))
+        if not args.no_cache:
+            # Stub SQL must not end up in the real plan cache
+            plan_cache = SQLPlanCache(":memory:")
+
+    def one(i):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        start = time.perf_counter()
+        result = query_sql(question, plan_cache=plan_cache, answer_mode=args.answer_mode)
+        return (time.perf_counter() - start) * 1000, result.get("confidence", 0.0) > 0, result.get("summary_source")
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, "
+          f"LLM {'configured backend' if args.real_llm else f'stub {args.latency_ms:g}+{args.jitter_ms:g} ms'}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [ms for ms, _, _ in results]
+    failed = sum(1 for _, ok, _ in results if not ok)
+    sources = Counter(source for _, _, source in results if source)
+    print(f"throughput {args.requests / elapsed:.1f} req/s, failed {failed}, summaries {dict(sources)}")
+    print(f"latency p50 {_percentile(latencies, 0.5):.0f} ms, p95 {_percentile(latencies, 0.95):.0f} ms, "
+          f"max {max(latencies):.0f} ms")
+    print("LLM:", llm_stats())
+
+
+if __name__ == "__main__":
+    main()
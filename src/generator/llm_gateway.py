@@ -0,0 +1,324 @@
+import os
+import re
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import deque
+
+from dotenv import load_dotenv
+
+from src.utils.resource_cache import get_resource
+
+load_dotenv()
+
+# LLM_BACKEND          "gemini", or "stub" for the deterministic local stand-in (no network, no key)
+# LLM_MODEL            Gemini model name
+# LLM_MAX_CONCURRENCY  calls in flight at once (per interface: sync threads / asyncio); the rest wait
+# LLM_MAX_CONNECTIONS  pooled keep-alive HTTP connections to the API
+# LLM_TIMEOUT          seconds one attempt may take
+# LLM_DEADLINE         seconds a call may take in total, retries and waiting for a slot included
+# LLM_MAX_RETRIES      retries after a timeout / 429 / 5xx / connection error
+# LLM_BACKOFF          first retry delay in seconds, doubled per retry (with jitter)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "models/gemini-2.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+BACKOFF_MAX = 8.0
+
+# Stub backend: latency = LLM_STUB_LATENCY_MS + up to LLM_STUB_JITTER_MS (fixed per prompt),
+# and LLM_STUB_ERROR_RATE of attempts fail with a retryable 503
+STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "0"))
+STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+# Latencies kept for the percentiles in stats()
+LATENCY_WINDOW = 1000
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class StubUnavailableError(Exception):
+    code = 503
+
+
+def retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if (getattr(error, "code", None) or getattr(error, "status_code", None)) in RETRY_STATUS:
+        return True
+    # httpx.ReadTimeout, httpx.ConnectError, httpx.RemoteProtocolError, ...
+    return any(word in type(error).__name__ for word in ("Timeout", "Connect", "RemoteProtocol"))
+
+
+def _tokens(text):
+    # Rough count for the stub / responses without usage metadata
+    return max(1, len(text) // 4)
+
+
+class GeminiBackend:
+    """google-genai client, created on first use and shared by every call (one HTTP connection pool)."""
+    def __init__(self, model=LLM_MODEL, max_connections=LLM_MAX_CONNECTIONS):
+        self.model = model
+        self.max_connections = max_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=self._http_options())
+        return self._client
+
+    def _http_options(self):
+        from google.genai import types
+        try:
+            import httpx
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            return types.HttpOptions(client_args={"limits": limits}, async_client_args={"limits": limits})
+        except Exception:
+            # Older google-genai without client_args: its default client still keeps connections alive
+            return None
+
+    def _config(self, timeout):
+        from google.genai import types
+        return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+    @staticmethod
+    def _result(response):
+        text = response.text or ""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        output_tokens = getattr(usage, "candidates_token_count", None) or _tokens(text)
+        return text, prompt_tokens, output_tokens
+
+    def generate(self, prompt, timeout):
+        response = self.client.models.generate_content(model=self.model, contents=prompt, config=self._config(timeout))
+        return self._result(response)
+
+    async def agenerate(self, prompt, timeout):
+        response = await asyncio.wait_for(
+            self.client.aio.models.generate_content(model=self.model, contents=prompt, config=self._config(timeout)),
+            timeout,
+        )
+        return self._result(response)
+
+
+class StubBackend:
+    """
+    Deterministic local stand-in for load tests and offline runs. SQL
+    prompts get a simple query on the first table in the schema (COUNT(*)
+    for "how many" questions), any other prompt a fixed summary line. Same
+    prompt, same answer and same injected latency.
+    """
+    def __init__(self, latency_ms=STUB_LATENCY_MS, jitter_ms=STUB_JITTER_MS,
+                 error_rate=STUB_ERROR_RATE, seed=STUB_SEED):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._errors = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _latency(self, prompt):
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        return (self.latency_ms + self.jitter_ms * (digest / 0xFFFFFFFF)) / 1000
+
+    def _fails(self):
+        with self._lock:
+            return self._errors.random() < self.error_rate
+
+    @staticmethod
+    def answer(prompt):
+        question = re.search(r"User Question:\s*(.+)", prompt)
+        question = question.group(1).strip() if question else ""
+        if "SELECT query" in prompt:
+            table = re.search(r"Table: (\S+)", prompt)
+            table = '"' + table.group(1) + '"' if table else "sqlite_master"
+            if re.search(r"\b(how many|count|number of)\b", question, re.IGNORECASE):
+                return f"SELECT COUNT(*) FROM {table};"
+            return f"SELECT * FROM {table} LIMIT 10;"
+        return f"Stub summary for: {question}"
+
+    def _result(self, prompt):
+        text = self.answer(prompt)
+        return text, _tokens(prompt), _tokens(text)
+
+    def generate(self, prompt, timeout):
+        latency = self._latency(prompt)
+        if latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub response took longer than {timeout:g}s")
+        time.sleep(latency)
+        if self._fails():
+            raise StubUnavailableError("stub backend: injected 503")
+        return self._result(prompt)
+
+    async def agenerate(self, prompt, timeout):
+        latency = self._latency(prompt)
+        if latency > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"stub response took longer than {timeout:g}s")
+        await asyncio.sleep(latency)
+        if self._fails():
+            raise StubUnavailableError("stub backend: injected 503")
+        return self._result(prompt)
+
+
+class LLMGateway:
+    """
+    The one way the app talks to an LLM: a shared backend, at most
+    max_concurrency calls in flight, each attempt limited to `timeout`
+    and the whole call (queueing and retries included) to `deadline`.
+    Retryable failures back off exponentially with jitter, never past the
+    deadline. Latency, attempts and token counts are tracked in stats().
+    """
+    def __init__(self, backend=None, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 deadline=LLM_DEADLINE, max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF):
+        self.backend = backend or (StubBackend() if LLM_BACKEND == "stub" else GeminiBackend())
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # asyncio semaphores belong to one event loop
+        self._async_slots = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {"calls": 0, "errors": 0, "retries": 0, "timeouts": 0, "in_flight": 0,
+                       "prompt_tokens": 0, "output_tokens": 0}
+
+    def _delay(self, attempt):
+        return min(BACKOFF_MAX, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _record(self, start, ok, attempts, prompt_tokens=0, output_tokens=0, timed_out=False):
+        with self._lock:
+            self._latencies.append((time.monotonic() - start) * 1000)
+            self._stats["calls"] += 1
+            self._stats["errors"] += 0 if ok else 1
+            self._stats["timeouts"] += 1 if timed_out else 0
+            self._stats["retries"] += max(0, attempts - 1)
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["output_tokens"] += output_tokens
+
+    def _in_flight(self, change):
+        with self._lock:
+            self._stats["in_flight"] += change
+
+    def _give_up(self, start, attempts, error):
+        timed_out = isinstance(error, (TimeoutError, asyncio.TimeoutError, LLMTimeoutError))
+        self._record(start, False, attempts, timed_out=timed_out)
+        if timed_out:
+            raise LLMTimeoutError(f"LLM call did not finish within {self.deadline:g}s") from error
+        raise LLMError(f"LLM call failed after {attempts} attempt(s): {error}") from error
+
+    def generate(self, prompt, deadline=None):
+        """Blocking call; returns the response text or raises LLMError / LLMTimeoutError."""
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        if not self._slots.acquire(timeout=max(0.0, end - time.monotonic())):
+            self._give_up(start, 0, LLMTimeoutError("no free LLM slot before the deadline"))
+        self._in_flight(1)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                remaining = end - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise TimeoutError("deadline reached")
+                    text, prompt_tokens, output_tokens = self.backend.generate(prompt, min(self.timeout, remaining))
+                    self._record(start, True, attempt, prompt_tokens, output_tokens)
+                    return text
+                except Exception as e:
+                    delay = self._delay(attempt - 1)
+                    if (not retryable(e) or attempt > self.max_retries
+                            or time.monotonic() + delay >= end):
+                        self._give_up(start, attempt, e)
+                    time.sleep(delay)
+        finally:
+            self._in_flight(-1)
+            self._slots.release()
+
+    def _async_slot(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_slots:
+                self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            return self._async_slots[loop]
+
+    async def agenerate(self, prompt, deadline=None):
+        """asyncio version of generate()."""
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        slots = self._async_slot()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0.0, end - time.monotonic()))
+        except asyncio.TimeoutError as e:
+            self._give_up(start, 0, e)
+        self._in_flight(1)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                remaining = end - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise TimeoutError("deadline reached")
+                    text, prompt_tokens, output_tokens = await self.backend.agenerate(
+                        prompt, min(self.timeout, remaining))
+                    self._record(start, True, attempt, prompt_tokens, output_tokens)
+                    return text
+                except Exception as e:
+                    delay = self._delay(attempt - 1)
+                    if (not retryable(e) or attempt > self.max_retries
+                            or time.monotonic() + delay >= end):
+                        self._give_up(start, attempt, e)
+                    await asyncio.sleep(delay)
+        finally:
+            self._in_flight(-1)
+            slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats["backend"] = type(self.backend).__name__
+        if latencies:
+            stats["p50_ms"] = latencies[len(latencies) // 2]
+            stats["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return stats
+
+
+def get_gateway():
+    """Process-wide gateway (and client / connection pool)."""
+    return get_resource("llm_gateway", LLMGateway)
+
+
+def generate(prompt, deadline=None):
+    return get_gateway().generate(prompt, deadline)
+
+
+async def agenerate(prompt, deadline=None):
+    return await get_gateway().agenerate(prompt, deadline)
+
+
+def llm_stats():
+    return get_gateway().stats()
@@ -1,15 +1,17 @@
-import os
 import re
-from google import genai
-from dotenv import load_dotenv
 
-load_dotenv()
+from src.generator.llm_gateway import generate
 
-client = genai.Client(
-    api_key=os.getenv("GEMINI_API_KEY"),
-)
 
-MODEL_NAME = "models/gemini-2.5-flash"   
+def call_llm(prompt: str, llm=None) -> str:
+    """
+    Send a prompt through the shared LLM gateway (Gemini, or the local stub
+    with LLM_BACKEND=stub) and return the text. `llm` (any callable
+    prompt -> text) bypasses the gateway, e.g. a stub for offline tests.
+    """
+    if llm is not None:
+        return llm(prompt)
+    return generate(prompt)
 
 def clean_sql(response_text: str) -> str:
     # Remove markdown code blocks
@@ -28,7 +30,7 @@ def clean_sql(response_text: str) -> str:
     # Fallback: return cleaned text
     return response_text.strip()
 
-def generate_sql(question: str, schema: str) -> str:
+def generate_sql(question: str, schema: str, llm=None) -> str:
     prompt = f"""
 You are a SQL expert.
 
@@ -43,9 +45,4 @@ User Question:
 {question}
 """
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=prompt
-    )
-
-    return clean_sql(response.text)
\ No newline at end of file
+    return clean_sql(call_llm(prompt, llm))
\ No newline at end of file
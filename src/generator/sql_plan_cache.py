@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+PLAN_CACHE_PATH = "src/data/sql_plan_cache.db"
+
+# SQL_PLAN_CACHE      0 = always ask the LLM
+# SQL_PLAN_SEMANTIC   1 = also reuse the SQL of a paraphrased question (off by default:
+#                     near-identical embeddings can still need different SQL)
+# SQL_PLAN_THRESHOLD  cosine similarity needed to reuse a paraphrased question's SQL
+USE_PLAN_CACHE = os.getenv("SQL_PLAN_CACHE", "1") == "1"
+USE_SEMANTIC = os.getenv("SQL_PLAN_SEMANTIC", "0") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("SQL_PLAN_THRESHOLD", "0.92"))
+
+# Parts of a question that change the SQL but barely move its embedding:
+# "balance over 1000" / "balance over 5000", "customers in Chile" / "customers
+# in Peru", "most customers" / "fewest customers". Two questions only share
+# SQL through a paraphrase match when all of these agree.
+LITERAL_RE = re.compile(r"\d+(?:\.\d+)?|'[^']*'|\"[^\"]*\"")
+CAPITALIZED_RE = re.compile(r"(?<=\s)[A-Z][\w-]*")
+DIRECTION_WORDS = {
+    "most", "least", "fewest", "highest", "lowest", "largest", "smallest", "biggest", "top", "bottom",
+    "first", "last", "latest", "earliest", "oldest", "newest", "max", "maximum", "min", "minimum",
+    "more", "less", "fewer", "over", "under", "above", "below", "before", "after", "since", "until",
+    "between", "not", "without", "exclude", "excluding", "asc", "ascending", "desc", "descending",
+}
+
+
+def normalize_question(question):
+    question = question.lower().strip()
+    question = re.sub(r"[^\w\s'\".]", " ", question)
+    question = re.sub(r"\.(?!\d)", " ", question)
+    return " ".join(question.split())
+
+
+def question_literals(question, known_values=()):
+    """
+    Numbers, quoted strings, capitalized words (past the first), comparison /
+    direction words and any known column value the question mentions.
+    """
+    lower = question.lower()
+    literals = set(LITERAL_RE.findall(lower))
+    literals.update(word.lower() for word in CAPITALIZED_RE.findall(question.strip()))
+    literals.update(DIRECTION_WORDS.intersection(re.findall(r"[a-z]+", lower)))
+    literals.update(value for value in known_values if re.search(rf"\b{re.escape(value)}\b", lower))
+    return " ".join(sorted(literals))
+
+
+def schema_hash(schema):
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+
+class SQLPlanCache:
+    """
+    Persistent question -> validated SQL cache, keyed by the normalized
+    question and a hash of the schema text, so a schema change makes every
+    old entry unreachable (and they are purged the first time the new
+    schema is seen).
+
+    With an embedder, a question that misses exactly can still reuse the
+    SQL of a paraphrase with cosine similarity >= threshold, as long as both
+    have the same question_literals(); `known_values` (lower-cased column
+    values, e.g. schema samples) are matched as literals too.
+    """
+    def __init__(self, db_path=PLAN_CACHE_PATH, embedder=None, threshold=SIMILARITY_THRESHOLD, known_values=()):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " schema_hash TEXT, question_key TEXT, question TEXT, literals TEXT,"
+            " sql TEXT, embedding BLOB, hits INTEGER DEFAULT 0, created_at REAL,"
+            " PRIMARY KEY (schema_hash, question_key))"
+        )
+        self.conn.commit()
+        self.embedder = embedder
+        self.threshold = threshold
+        self.known_values = frozenset(v.lower() for v in known_values)
+        self._lock = threading.Lock()
+        self._known_schema = None
+        # schema_hash -> (sqls, literals, unit-norm embedding matrix), rebuilt after writes
+        self._vectors = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def _check_schema(self, schema_key):
+        if schema_key == self._known_schema:
+            return
+        self.conn.execute("DELETE FROM plans WHERE schema_hash != ?", (schema_key,))
+        self.conn.commit()
+        self._vectors = {}
+        self._known_schema = schema_key
+
+    def _embed(self, question):
+        vector = np.asarray(self.embedder.embed([question])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _semantic_index(self, schema_key):
+        if schema_key not in self._vectors:
+            rows = self.conn.execute(
+                "SELECT sql, literals, embedding FROM plans WHERE schema_hash = ? AND embedding IS NOT NULL",
+                (schema_key,)
+            ).fetchall()
+            matrix = np.vstack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) if rows else None
+            self._vectors[schema_key] = ([r[0] for r in rows], [r[1] for r in rows], matrix)
+        return self._vectors[schema_key]
+
+    def get(self, question, schema_key):
+        """Cached SQL for the question under this schema, or None."""
+        key = normalize_question(question)
+        with self._lock:
+            self._check_schema(schema_key)
+            row = self.conn.execute(
+                "SELECT sql FROM plans WHERE schema_hash = ? AND question_key = ?", (schema_key, key)
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE plans SET hits = hits + 1 WHERE schema_hash = ? AND question_key = ?", (schema_key, key)
+                )
+                self.conn.commit()
+                self.stats["exact_hits"] += 1
+                return row[0]
+
+            if self.embedder is not None:
+                sqls, literals, matrix = self._semantic_index(schema_key)
+                if matrix is not None:
+                    scores = matrix @ self._embed(question)
+                    wanted = question_literals(question, self.known_values)
+                    for i in np.argsort(-scores):
+                        if scores[i] < self.threshold:
+                            break
+                        if literals[i] == wanted:
+                            self.stats["semantic_hits"] += 1
+                            return sqls[i]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question, schema_key, sql):
+        """Store SQL that passed validation."""
+        embedding = self._embed(question).tobytes() if self.embedder is not None else None
+        with self._lock:
+            self._check_schema(schema_key)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO plans (schema_hash, question_key, question, literals, sql, embedding, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (schema_key, normalize_question(question), question, question_literals(question, self.known_values),
+                 sql, embedding, time.time())
+            )
+            self.conn.commit()
+            self._vectors.pop(schema_key, None)
+
+    def evict(self, schema_key, sql):
+        """Forget SQL that failed when it ran (under every question it was stored for)."""
+        with self._lock:
+            self.conn.execute("DELETE FROM plans WHERE schema_hash = ? AND sql = ?", (schema_key, sql))
+            self.conn.commit()
+            self._vectors.pop(schema_key, None)
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM plans")
+            self.conn.commit()
+            self._vectors = {}
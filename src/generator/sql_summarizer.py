@@ -0,0 +1,115 @@
+import os
+import re
+
+# SQL_ANSWER_MODE     "llm"      = every result is summarized by the LLM (two round trips per question)
+#                     "template" = common result shapes (empty, one value, one row, a short list,
+#                                  a small group-by table) are described from a template; only
+#                                  other results go to the LLM
+# SQL_SUMMARY_TOKENS  rough token budget for the rows put into the summary prompt
+ANSWER_MODE = os.getenv("SQL_ANSWER_MODE", "llm")
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SQL_SUMMARY_TOKENS", "600"))
+
+# Largest results still described by a template
+TEMPLATE_MAX_ROWS = 10
+TEMPLATE_MAX_COLUMNS = 6
+CELL_MAX_CHARS = 40
+
+AGGREGATE_RE = re.compile(r"^(count|sum|total|avg|min|max)\s*\(\s*(distinct\s+)?(.*?)\s*\)$", re.IGNORECASE)
+
+
+def _tokens(text):
+    return len(text) // 4 + 1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def format_value(value):
+    if value is None:
+        return "none"
+    if isinstance(value, float):
+        return f"{int(value):,}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)[:CELL_MAX_CHARS]
+
+
+def label(column):
+    """'total_customers' -> 'Total customers', 'AVG("Score")' -> 'Average score'."""
+    match = AGGREGATE_RE.match(column.strip())
+    if match:
+        func, distinct, arg = match.group(1).lower(), match.group(2), match.group(3).strip('"`[]')
+        arg = "" if arg == "*" else label(arg).lower()
+        if func == "count":
+            return f"Number of {'distinct ' if distinct else ''}{arg or 'records'}".strip()
+        prefix = {"sum": "Total", "total": "Total", "avg": "Average", "min": "Lowest", "max": "Highest"}[func]
+        return f"{prefix} {arg}".strip()
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", column.strip('"`[]'))
+    text = re.sub(r"[_\s]+", " ", text).strip()
+    return text[:1].upper() + text[1:]
+
+
+def template_summary(columns, rows, truncated=False):
+    """
+    Summary text for the common result shapes, or None when the result needs
+    the LLM (too many rows or columns, a cut-off result, or an unusual shape).
+    """
+    if not rows:
+        return "No matching records were found."
+    if truncated or len(rows) > TEMPLATE_MAX_ROWS or len(columns) > TEMPLATE_MAX_COLUMNS:
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        value = rows[0][0]
+        if value is None:
+            return f"{label(columns[0])}: no value (nothing matched)."
+        return f"{label(columns[0])}: {format_value(value)}."
+
+    if len(rows) == 1:
+        return "; ".join(f"{label(c)}: {format_value(v)}" for c, v in zip(columns, rows[0])) + "."
+
+    if len(columns) == 1:
+        values = ", ".join(format_value(row[0]) for row in rows)
+        return f"{len(rows)} results for {label(columns[0]).lower()}: {values}."
+
+    if len(columns) == 2 and all(_is_number(row[1]) for row in rows) and not all(_is_number(row[0]) for row in rows):
+        # Small group-by table: category -> number
+        items = ", ".join(f"{format_value(key)}: {format_value(value)}" for key, value in rows)
+        top = max(rows, key=lambda row: row[1])
+        return (f"{label(columns[1])} by {label(columns[0]).lower()}: {items}. "
+                f"Highest: {format_value(top[0])} ({format_value(top[1])}).")
+    return None
+
+
+def compact_rows(columns, rows, truncated=False, token_budget=SUMMARY_TOKEN_BUDGET):
+    """
+    Text view of the result for the summary prompt: a pipe-separated table
+    with long cells cut, filled row by row until the token budget is used.
+    When rows are left out, min / max / mean of the numeric columns over all
+    returned rows are added so the summary can still describe them.
+    """
+    header = " | ".join(columns)
+    lines = [header]
+    used = _tokens(header)
+    shown = 0
+    for row in rows:
+        line = " | ".join(format_value(v) for v in row)
+        cost = _tokens(line)
+        if used + cost > token_budget and shown:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+
+    notes = []
+    if shown < len(rows):
+        notes.append(f"({len(rows) - shown} more rows not shown)")
+        for i, column in enumerate(columns):
+            values = [row[i] for row in rows if _is_number(row[i])]
+            if values and len(values) == sum(1 for row in rows if row[i] is not None):
+                notes.append(f"{column}: min {format_value(min(values))}, max {format_value(max(values))}, "
+                             f"mean {format_value(sum(values) / len(values))}")
+    if truncated:
+        notes.append(f"(the query matched more than the {len(rows)} rows returned)")
+    return "\n".join(lines + notes)
@@ -5,31 +5,83 @@ from PIL import Image
 import chromadb
 import sys
 import pytesseract
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from src.embeddings.clip_embedder import CLIPEmbedder
+from src.utils.resource_cache import get_resource
+from src.utils.inference_config import optimize_for_inference, inference_mode
 
-class ImageIngestionPipeline:
-    def __init__(self, vector_store_dir="vectorstore"):
-        # CLIP
-        self.embedder = CLIPEmbedder()
-
-        # BLIP captioning
-        print("Loading BLIP captioning model...")
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model.eval()
-        print("BLIP ready ✓")
-
-        # ChromaDB
-        self.client = chromadb.PersistentClient(path=vector_store_dir)
-        self.collection = self.client.get_or_create_collection(
-            name="image_rag",
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-base"
+COLLECTION_NAME = "image_rag"
+
+
+# ---------------- Shared components (loaded on first use) ----------------
+def get_clip_embedder():
+    return get_resource("clip_embedder", CLIPEmbedder)
+
+
+def _load_blip(quantize=None):
+    # transformers is imported here so query-only processes never pay for it
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+
+    print("Loading BLIP captioning model...")
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME)
+    model = optimize_for_inference(model, quantize)
+    print("BLIP ready ✓")
+    return processor, model
+
+
+def get_blip():
+    return get_resource("blip", _load_blip)
+
+
+def get_chroma_client(vector_store_dir="vectorstore"):
+    return get_resource(
+        ("chroma_client", vector_store_dir),
+        lambda: chromadb.PersistentClient(path=vector_store_dir)
+    )
+
+
+def get_image_collection(vector_store_dir="vectorstore"):
+    def _load():
+        collection = get_chroma_client(vector_store_dir).get_or_create_collection(
+            name=COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"}
         )
-        print(f"Vector store ready. Total docs: {self.collection.count()}")
+        print(f"Vector store ready. Total docs: {collection.count()}")
+        return collection
+
+    return get_resource(("image_collection", vector_store_dir), _load)
+
+
+class ImageIngestionPipeline:
+    """
+    Components are loaded lazily and shared process-wide, so building a
+    pipeline is free and BLIP is only loaded when a caption is requested.
+    """
+    def __init__(self, vector_store_dir="vectorstore"):
+        self.vector_store_dir = vector_store_dir
+
+    @property
+    def embedder(self):
+        return get_clip_embedder()
+
+    @property
+    def blip_processor(self):
+        return get_blip()[0]
+
+    @property
+    def blip_model(self):
+        return get_blip()[1]
+
+    @property
+    def client(self):
+        return get_chroma_client(self.vector_store_dir)
+
+    @property
+    def collection(self):
+        return get_image_collection(self.vector_store_dir)
 
     def extract_ocr(self, image):
         try:
@@ -43,7 +95,7 @@ class ImageIngestionPipeline:
     def generate_caption(self, image):
         try:
             inputs = self.blip_processor(image, return_tensors="pt")
-            with torch.no_grad():
+            with inference_mode():
                 output = self.blip_model.generate(**inputs, max_new_tokens=50)
             caption = self.blip_processor.decode(output[0], skip_special_tokens=True)
             return caption
@@ -104,14 +156,13 @@ class ImageIngestionPipeline:
 def query_image(file_path, top_k=5):
     """
     Capstone helper for /ask-image
+    Only needs CLIP and the image_rag collection; BLIP is never loaded here.
     """
-    pipeline = ImageIngestionPipeline(vector_store_dir="vectorstore")
-
     # Embed input image
-    embedding = pipeline.embedder.embed_image(file_path)
+    embedding = get_clip_embedder().embed_image(file_path)
 
     # Query ChromaDB
-    results = pipeline.collection.query(
+    results = get_image_collection("vectorstore").query(
         query_embeddings=[embedding.tolist()],
         n_results=top_k,
         include=['documents','metadatas','distances']
@@ -1,53 +1,217 @@
 import os
-import json
 import numpy as np
 
-from src.utils.document_loader import load_documents_from_folder
-from src.utils.text_cleaner import clean_text
-from src.utils.chunker import chunk_text
+from src.pipelines.parallel_ingest import plan_tasks, iter_extracted
 from src.embeddings.embedder import Embedder
-from src.vectorstore.faiss_index import build_faiss_index, load_faiss_index, search_faiss_index
+from src.vectorstore.faiss_index import (
+    build_faiss_index, load_faiss_index, search_faiss_index, save_faiss_index, load_faiss_config,
+    is_id_mapped, add_to_faiss_index, remove_from_faiss_index
+)
+from src.retriever.bm25_index import build_bm25_index
+from src.retriever.metadata_index import build_metadata_index
+from src.pipelines.ingest_manifest import (
+    MANIFEST_PATH, load_manifest, save_manifest, empty_manifest, diff_manifest, allocate_ids
+)
+from src.utils.append_store import VectorFile
+from src.utils.chunk_store import ChunkStore
+from src.utils.resource_cache import get_resource
 
 RAW_DATA_PATH = "src/data/raw"
-CHUNK_SAVE_PATH = "src/data/chunks/chunks.json"
-EMBED_SAVE_PATH = "src/data/embeddings/embeddings.npy"
+CHUNK_SAVE_PATH = "src/data/chunks/chunks.db"
+EMBED_SAVE_PATH = "src/data/embeddings/embeddings.f32"
 INDEX_SAVE_PATH = "src/data/vectorstore/index.faiss"
-
-
-def main():
-    print("Loading documents...")
-    documents = load_documents_from_folder(RAW_DATA_PATH)
-    print(f"Loaded {len(documents)} pages.")
-
-    print("Cleaning & chunking...")
-    all_chunks = []
-
-    for doc in documents:
-        doc["text"] = clean_text(doc["text"])
-        chunks = chunk_text(doc)
-        all_chunks.extend(chunks)
-
-    print(f"Created {len(all_chunks)} chunks.")
-
-    os.makedirs("src/data/chunks", exist_ok=True)
-    with open(CHUNK_SAVE_PATH, "w") as f:
-        json.dump(all_chunks, f, indent=2)
-
-    print("Generating embeddings...")
-    embedder = Embedder()
-    texts = [chunk["text"] for chunk in all_chunks]
-    embeddings = embedder.embed(texts)
-
-    os.makedirs("src/data/embeddings", exist_ok=True)
-    np.save(EMBED_SAVE_PATH, embeddings)
-
-    print("Building FAISS index...")
-    build_faiss_index(embeddings, INDEX_SAVE_PATH)
+BM25_SAVE_DIR = "src/data/vectorstore/bm25"
+METADATA_SAVE_DIR = "src/data/vectorstore/metadata"
+
+# flat | ivf_flat | ivf_pq | hnsw | sq8 (see vectorstore/faiss_index.py)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+
+# Chunks are embedded this many at a time; a checkpoint is written every
+# CHECKPOINT_EVERY batches, so a crash loses at most that much work
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "20"))
+
+
+class ChunkSink:
+    """Buffers chunks, embeds them in fixed-size batches and appends both to disk."""
+    def __init__(self, embedder, chunk_store, vector_file, batch_size=EMBED_BATCH_SIZE):
+        self.embedder = embedder
+        self.chunk_store = chunk_store
+        self.vector_file = vector_file
+        self.batch_size = batch_size
+        self.buffer = []
+        self.batches = 0
+        self.total = 0
+
+    def add(self, chunks):
+        self.buffer.extend(chunks)
+        while len(self.buffer) >= self.batch_size:
+            self._write(self.buffer[:self.batch_size])
+            self.buffer = self.buffer[self.batch_size:]
+
+    def flush(self):
+        if self.buffer:
+            self._write(self.buffer)
+            self.buffer = []
+
+    def _write(self, batch):
+        embeddings = self.embedder.embed([chunk["text"] for chunk in batch])
+        self.vector_file.append([chunk["id"] for chunk in batch], embeddings)
+        self.chunk_store.append(batch)
+        self.batches += 1
+        self.total += len(batch)
+
+    def checkpoint(self, manifest):
+        self.flush()
+        self.chunk_store.sync()
+        manifest["store"] = {"embedding_rows": self.vector_file.sync()}
+        save_manifest(manifest, MANIFEST_PATH)
+        self.batches = 0
+
+
+def drop_stale(manifest, stale_ids, chunk_store, vector_file):
+    """Remove chunks of changed/deleted PDFs from the index and the stores."""
+    if not stale_ids:
+        return
+    print(f"Removing {len(stale_ids)} stale chunks...")
+
+    # Index first: if we crash after this, the rerun removes the same IDs again (a no-op)
+    if os.path.exists(INDEX_SAVE_PATH) and not manifest["index_rebuild"]:
+        config = load_faiss_config(INDEX_SAVE_PATH)
+        index = load_faiss_index(INDEX_SAVE_PATH)
+        if is_id_mapped(index) and remove_from_faiss_index(index, list(stale_ids)):
+            save_faiss_index(index, INDEX_SAVE_PATH, config["index_type"], config["params"])
+        else:
+            manifest["index_rebuild"] = True
+
+    chunk_store.delete(stale_ids)
+    manifest["store"] = {"embedding_rows": vector_file.compact(stale_ids)}
+    manifest["keyword_rebuild"] = True
+    save_manifest(manifest, MANIFEST_PATH)
+
+
+def main(full_rebuild=False):
+    chunk_store = ChunkStore(CHUNK_SAVE_PATH, readonly=False)
+    vector_file = VectorFile(EMBED_SAVE_PATH)
+
+    manifest = load_manifest(MANIFEST_PATH)
+    if full_rebuild or not vector_file.exists():
+        manifest = empty_manifest()
+
+    # Roll back anything appended after the last checkpoint
+    chunk_store.truncate(manifest["next_id"])
+    vector_file.truncate(manifest["store"]["embedding_rows"])
+
+    print("Checking documents...")
+    to_ingest, to_resume, removed, hashes = diff_manifest(manifest, RAW_DATA_PATH)
+    print(f"{len(hashes)} PDFs: {len(to_ingest)} new/changed, {len(to_resume)} to resume, "
+          f"{len(removed)} removed.")
+
+    index_synced = (
+        os.path.exists(INDEX_SAVE_PATH)
+        and manifest["index_next_id"] == manifest["next_id"]
+        and not manifest["index_rebuild"]
+        and not manifest["keyword_rebuild"]
+        and load_faiss_config(INDEX_SAVE_PATH)["index_type"] == FAISS_INDEX_TYPE
+    )
+    if not to_ingest and not to_resume and not removed and index_synced:
+        print("✔ Index is up to date")
+        return
+
+    # Chunks of changed and deleted files are dropped by ID
+    stale_ids = set()
+    for file in to_ingest + removed:
+        stale_ids.update(manifest["files"].pop(file, {}).get("chunk_ids", []))
+    drop_stale(manifest, stale_ids, chunk_store, vector_file)
+
+    for file in to_ingest:
+        manifest["files"][file] = {"sha256": hashes[file], "chunk_ids": [], "pages_done": 0, "complete": False}
+
+    print("Cleaning, chunking & embedding...")
+    embedder = get_resource("embedder", Embedder)
+    sink = ChunkSink(embedder, chunk_store, vector_file)
+    files = sorted(to_resume + to_ingest)
+    paths = [os.path.join(RAW_DATA_PATH, file) for file in files]
+    start_pages = {path: manifest["files"][file]["pages_done"] for file, path in zip(files, paths)}
+
+    for (path, start, end, n_pages), chunks in iter_extracted(plan_tasks(paths, start_pages=start_pages)):
+        entry = manifest["files"][os.path.basename(path)]
+        ids = allocate_ids(manifest, len(chunks))
+        for chunk, chunk_id in zip(chunks, ids):
+            chunk["id"] = chunk_id
+        sink.add(chunks)
+
+        entry["chunk_ids"].extend(ids)
+        entry["pages_done"] = end
+        entry["complete"] = end >= n_pages
+
+        if sink.batches >= CHECKPOINT_EVERY:
+            sink.checkpoint(manifest)
+
+    sink.checkpoint(manifest)
+    vector_file.close()
+    print(f"Embedded {sink.total} chunks.")
+
+    update_faiss(manifest, vector_file)
+
+    print("Building BM25 index...")
+    build_bm25_index(
+        (chunk["text"] for chunk in chunk_store.iter_chunks()), BM25_SAVE_DIR,
+        ids=(chunk["id"] for chunk in chunk_store.iter_chunks())
+    )
+
+    print("Building metadata index...")
+    build_metadata_index(chunk_store.iter_chunks(), METADATA_SAVE_DIR)
+    chunk_store.close()
+
+    manifest["keyword_rebuild"] = False
+    save_manifest(manifest, MANIFEST_PATH)
 
     print("✔ Documents loaded")
     print("✔ Chunks created")
     print("✔ Embeddings generated")
     print("✔ Vector DB initialized")
+    print("✔ Keyword index built")
+    print("✔ Metadata index built")
+
+
+def update_faiss(manifest, vector_file):
+    """Add the chunks the index hasn't seen yet; rebuild from stored vectors when it can't be patched."""
+    ids, embeddings = vector_file.load()
+    config = load_faiss_config(INDEX_SAVE_PATH)
+    can_patch = (
+        os.path.exists(INDEX_SAVE_PATH)
+        and not manifest["index_rebuild"]
+        and config["index_type"] == FAISS_INDEX_TYPE
+    )
+
+    if can_patch:
+        index = load_faiss_index(INDEX_SAVE_PATH)
+        if is_id_mapped(index):
+            # IDs are allocated in increasing order, so the unseen rows are a suffix
+            first_new = int(np.searchsorted(ids, manifest["index_next_id"]))
+            print(f"Updating FAISS index ({FAISS_INDEX_TYPE}) with {len(ids) - first_new} vectors...")
+            add_to_faiss_index(index, embeddings[first_new:], ids[first_new:])
+            save_faiss_index(index, INDEX_SAVE_PATH, config["index_type"], config["params"])
+            mark_indexed(manifest)
+            return
+
+    # No re-embedding needed: the index is rebuilt from the stored vectors
+    print(f"Building FAISS index ({FAISS_INDEX_TYPE})...")
+    build_faiss_index(embeddings, INDEX_SAVE_PATH, index_type=FAISS_INDEX_TYPE, ids=ids)
+    mark_indexed(manifest)
+
+
+def mark_indexed(manifest):
+    """
+    Record right after the FAISS index is saved that it holds every chunk, so
+    a run killed before the keyword indexes are built doesn't add the same
+    IDs again; those indexes are flagged for rebuilding instead.
+    """
+    manifest["index_next_id"] = manifest["next_id"]
+    manifest["index_rebuild"] = False
+    manifest["keyword_rebuild"] = True
+    save_manifest(manifest, MANIFEST_PATH)
 
 
 # ---------------- Capstone Query Function ----------------
@@ -58,20 +222,18 @@ def query_text(query, top_k=5):
     """
     # Load FAISS index
     index = load_faiss_index(INDEX_SAVE_PATH)
-    embeddings = np.load(EMBED_SAVE_PATH)
-    embedder = Embedder()
+    embedder = get_resource("embedder", Embedder)
 
     # Embed query
-    query_embedding = embedder.embed([query])[0]
+    query_embedding = embedder.embed([query])
 
-    # Retrieve top_k chunks
+    # Retrieve top_k chunks (the index returns chunk IDs)
     scores, indices = search_faiss_index(index, query_embedding, top_k=top_k)
 
-    # Load chunks
-    with open(CHUNK_SAVE_PATH, "r") as f:
-        chunks = json.load(f)
+    # Fetch only the retrieved chunks
+    chunks = ChunkStore(CHUNK_SAVE_PATH).get_many(indices[0])
 
-    retrieved_texts = [chunks[i]["text"] for i in indices]
+    retrieved_texts = [chunk["text"] for chunk in chunks]
 
     # Simple answer generation: concatenate top chunks (replace with LLM if needed)
     answer = " ".join(retrieved_texts)
@@ -81,4 +243,5 @@ def query_text(query, top_k=5):
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import sys
+    main(full_rebuild="--full" in sys.argv)
\ No newline at end of file
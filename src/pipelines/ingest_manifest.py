@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+
+
+MANIFEST_PATH = "src/data/manifest.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def empty_manifest():
+    # store:         embedding rows at the last checkpoint (chunks above next_id
+    #                in the chunk store were written after it)
+    # index_next_id: chunk IDs below this are already in the FAISS index
+    # index_rebuild: the index on disk can't be patched (fresh start, HNSW removals)
+    # keyword_rebuild: chunks changed since the BM25 / metadata indexes were built
+    return {
+        "next_id": 0,
+        "files": {},
+        "store": {"embedding_rows": 0},
+        "index_next_id": 0,
+        "index_rebuild": True,
+        "keyword_rebuild": False,
+    }
+
+
+def load_manifest(path=MANIFEST_PATH):
+    manifest = empty_manifest()
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            manifest.update(json.load(f))
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def diff_manifest(manifest, folder_path):
+    """
+    Compare the PDFs in folder_path with the manifest.
+    Returns (to_ingest, to_resume, removed, hashes):
+      to_ingest  new or changed filenames, sorted
+      to_resume  unchanged files an interrupted run only partly ingested
+      removed    filenames in the manifest that are gone from disk
+      hashes     {filename: sha256} for every PDF on disk
+    """
+    hashes = {}
+    for file in sorted(os.listdir(folder_path)):
+        if file.endswith(".pdf"):
+            hashes[file] = file_sha256(os.path.join(folder_path, file))
+
+    known = manifest["files"]
+    to_ingest = [f for f, h in hashes.items() if known.get(f, {}).get("sha256") != h]
+    to_resume = [
+        f for f, h in hashes.items()
+        if f not in to_ingest and not known[f].get("complete", True)
+    ]
+    removed = sorted(f for f in known if f not in hashes)
+    return to_ingest, to_resume, removed, hashes
+
+
+def allocate_ids(manifest, count):
+    start = manifest["next_id"]
+    manifest["next_id"] = start + count
+    return list(range(start, start + count))
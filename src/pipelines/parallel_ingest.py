@@ -0,0 +1,91 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils.document_loader import load_pdf, count_pages
+from src.utils.text_cleaner import clean_text
+from src.utils.chunker import chunk_text
+
+# Large PDFs are split into page ranges of this size so one long filing
+# doesn't leave the other workers idle
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "32"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+# Tasks in flight per worker; bounds how many finished-but-unconsumed
+# results can pile up in memory
+TASKS_IN_FLIGHT = 2
+
+
+def _process_range(task):
+    file_path, start, end, _ = task
+    chunks = []
+    pages = load_pdf(file_path, page_range=(start, end))
+    for doc in pages:
+        doc["text"] = clean_text(doc["text"])
+        chunks.extend(chunk_text(doc))
+    return chunks
+
+
+def plan_tasks(file_paths, pages_per_task=PAGES_PER_TASK, start_pages=None):
+    """
+    Split files into (file_path, start, end, n_pages) page ranges.
+    start_pages: optional {file_path: first page} to resume part-way through.
+    """
+    start_pages = start_pages or {}
+    tasks = []
+    for file_path in file_paths:
+        n_pages = count_pages(file_path)
+        first = start_pages.get(file_path, 0)
+        if first >= n_pages:
+            tasks.append((file_path, n_pages, n_pages, n_pages))
+            continue
+        for start in range(first, n_pages, pages_per_task):
+            tasks.append((file_path, start, min(start + pages_per_task, n_pages), n_pages))
+    return tasks
+
+
+def iter_extracted(tasks, workers=INGEST_WORKERS):
+    """
+    Yield (task, chunks) in task order while a process pool works ahead.
+    At most workers * TASKS_IN_FLIGHT tasks are pending at once.
+    """
+    started = time.perf_counter()
+    total_pages = 0
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        for task in tasks:
+            yield task, _process_range(task)
+            total_pages += task[2] - task[1]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            remaining = iter(tasks)
+            for task in remaining:
+                pending.append((task, executor.submit(_process_range, task)))
+                if len(pending) >= workers * TASKS_IN_FLIGHT:
+                    break
+            while pending:
+                task, future = pending.popleft()
+                next_task = next(remaining, None)
+                if next_task is not None:
+                    pending.append((next_task, executor.submit(_process_range, next_task)))
+                yield task, future.result()
+                total_pages += task[2] - task[1]
+
+    elapsed = time.perf_counter() - started
+    rate = total_pages / elapsed if elapsed > 0 else 0.0
+    print(f"Extracted {total_pages} pages in {elapsed:.1f}s ({rate:.1f} pages/sec, {workers} workers)")
+
+
+def extract_and_chunk(file_paths, workers=INGEST_WORKERS, pages_per_task=PAGES_PER_TASK):
+    """
+    Extract, clean and chunk PDFs across a process pool.
+    Returns {file_path: [chunks]} with chunks in page order, exactly as a
+    serial run would produce them.
+    """
+    results = {file_path: [] for file_path in file_paths}
+    for task, chunks in iter_extracted(plan_tasks(file_paths, pages_per_task), workers):
+        results[task[0]].extend(chunks)
+    return results
@@ -1,18 +1,28 @@
 import os
 import re
+import time
 import sqlite3
-import pandas as pd
 from dotenv import load_dotenv
-from google import genai
-from src.utils.schema_loader import load_schema
-from src.generator.sql_generator import generate_sql
+from src.utils.schema_loader import load_schema, prune_schema, get_schema_info
+from src.generator.sql_generator import generate_sql, call_llm
+from src.generator.llm_gateway import LLMError
+from src.generator.sql_summarizer import ANSWER_MODE, template_summary, compact_rows
+from src.generator.sql_plan_cache import (
+    SQLPlanCache, PLAN_CACHE_PATH, USE_PLAN_CACHE, USE_SEMANTIC, schema_hash, normalize_question
+)
+from src.utils.sql_result_cache import ResultCache, USE_RESULT_CACHE, canonical_sql, db_version
+from src.utils.sql_executor import get_executor, format_table, bounded_sql, SQLTimeoutError
+from src.utils.sql_admission import admit, admission_lane, USE_ADMISSION, SQLRejectedError
+from src.utils.jsonl_log import get_logger
+from src.utils.resource_cache import get_resource
 
 load_dotenv()
 
 DB_PATH = "src/data/raw/customers.db"
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-MODEL_NAME = "models/gemini-2.5-flash"
+# Every executed query with its plan and timing, for src/evaluation/index_advisor.py
+QUERY_LOG = "SQL-QUERY-LOG.jsonl"
+RECORD_QUERIES = os.getenv("SQL_QUERY_LOG", "1") == "1"
 
 def validate_sql(sql: str) -> bool:
     sql = sql.strip().lower()
@@ -30,25 +40,171 @@ def validate_sql(sql: str) -> bool:
 
 
 def execute_sql(sql: str):
-    conn = sqlite3.connect(DB_PATH)
+    # Pooled read-only connection; at most SQL_MAX_ROWS rows are ever fetched
+    decision = admit_sql(sql)
+    with admission_lane(decision):
+        columns, rows, truncated = get_executor(DB_PATH).execute(decision["sql"], decision["max_rows"])
+    return columns, rows
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute(sql)
 
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
+def admit_sql(sql: str):
+    """Admission decision for validated SQL (see utils/sql_admission.py); raises if rejected."""
+    if not USE_ADMISSION:
+        return {"action": "run", "sql": sql, "max_rows": None, "cost": None, "plan": None,
+                "reason": "admission control off"}
+    decision = admit(sql, DB_PATH)
+    if decision["action"] == "reject":
+        raise SQLRejectedError(decision["reason"])
+    return decision
+
+
+def execute_recorded(sql: str, question: str = ""):
+    """
+    Admission check, then execute() plus a query-log record: the SQL as
+    run, its query plan (the one admission already read), estimated cost
+    and time.
+    """
+    executor = get_executor(DB_PATH)
+    decision = admit_sql(sql)
+    with admission_lane(decision):
+        start = time.perf_counter()
+        columns, rows, truncated = executor.execute(decision["sql"], decision["max_rows"])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if RECORD_QUERIES:
+        plan = decision["plan"]
+        get_logger(QUERY_LOG).log({
+            "db": DB_PATH,
+            "question": question,
+            "sql": bounded_sql(decision["sql"], decision["max_rows"] or executor.max_rows),
+            "canonical": canonical_sql(sql),
+            "plan": [detail for _, _, detail in plan] if plan else executor.explain(decision["sql"]),
+            "admission": decision["action"],
+            "cost": decision["cost"],
+            "ms": round(elapsed_ms, 3),
+            "rows": len(rows),
+        })
+    return columns, rows, truncated
+
+
+def stream_sql(sql: str, page_size=None):
+    """Yield (columns, rows) pages of the result as they are fetched (after the admission check)."""
+    executor = get_executor(DB_PATH)
+    decision = admit_sql(sql)
+    with admission_lane(decision):
+        if page_size:
+            yield from executor.pages(decision["sql"], page_size, max_rows=decision["max_rows"])
+        else:
+            yield from executor.pages(decision["sql"], max_rows=decision["max_rows"])
+
+
+def get_embedder():
+    """Same shared MiniLM instance the text retriever uses (None if disabled)."""
+    if not USE_SEMANTIC:
+        return None
+    from src.embeddings.embedder import Embedder
+    return get_resource("embedder", Embedder)
+
+
+def get_plan_cache():
+    def build():
+        # Sample values ("chile", "gold", ...) must match for a paraphrase to share SQL
+        samples = [v for columns in get_schema_info(DB_PATH).values() for col in columns
+                   for v in col["samples"] if len(v) > 2]
+        return SQLPlanCache(PLAN_CACHE_PATH, embedder=get_embedder(), known_values=samples)
+    return get_resource("sql_plan_cache", build)
+
+
+def plan_sql(question: str, schema: str, llm=None, cache=None):
+    """
+    SQL for the question: from the plan cache when this (or a paraphrased)
+    question was answered before under the same schema, otherwise from the
+    LLM, prompted with only the relevant part of the schema. New SQL is not
+    cached here; remember_plan() does that once it has run successfully.
+    Returns (sql, from_cache).
+    """
+    if cache is None and USE_PLAN_CACHE:
+        cache = get_plan_cache()
 
-        rows = rows[:100]
+    if cache is not None:
+        sql = cache.get(question, schema_hash(schema))
+        if sql:
+            return sql, True
 
-        return columns, rows
+    # Column matching uses the plan cache's embedder when there is one, keywords otherwise
+    prompt_schema = prune_schema(question, DB_PATH, embedder=cache.embedder if cache is not None else None)
+    return generate_sql(question, prompt_schema, llm=llm), False
 
-    finally:
-        conn.close()
 
+def remember_plan(question: str, schema: str, sql: str, cache=None):
+    """Cache SQL that passed validation and ran without error."""
+    if cache is None and USE_PLAN_CACHE:
+        cache = get_plan_cache()
+    if cache is not None and validate_sql(sql):
+        cache.put(question, schema_hash(schema), sql)
 
-def summarize_result(question: str, columns, rows):
-    table_preview = f"Columns: {columns}\nRows: {rows}"
+
+def forget_plan(schema: str, sql: str, cache=None):
+    """Drop cached SQL that failed (error, timeout or refused by admission)."""
+    if cache is None and USE_PLAN_CACHE:
+        cache = get_plan_cache()
+    if cache is not None:
+        cache.evict(schema_hash(schema), sql)
+
+
+def get_result_cache():
+    return get_resource("sql_result_cache", ResultCache)
+
+
+def run_cached(question: str, sql: str, llm=None, cache=None, answer_mode=None):
+    """
+    Rows and summary for the SQL, reusing both when the same (canonical) SQL
+    already ran on this version of the database. The summary is kept per
+    answer mode and question, so a reworded question over the same rows
+    only re-summarizes.
+    Returns (columns, rows, truncated, summary, summary_source, cached).
+    """
+    if cache is None and USE_RESULT_CACHE:
+        cache = get_result_cache()
+
+    key = (DB_PATH, db_version(DB_PATH), canonical_sql(sql))
+    entry = cache.get(key) if cache is not None else None
+    cached = entry is not None
+    if entry is None:
+        columns, rows, truncated = execute_recorded(sql, question)
+        entry = {"columns": columns, "rows": rows, "truncated": truncated, "summaries": {}}
+
+    question_key = (answer_mode or ANSWER_MODE, normalize_question(question))
+    summary = entry["summaries"].get(question_key)
+    summary_cached = summary is not None
+    if summary is None:
+        summary = summarize(question, entry["columns"], entry["rows"], entry["truncated"], llm=llm, mode=answer_mode)
+        # A new entry rather than changing the cached one, which other requests may be reading
+        entry = dict(entry, summaries={**entry["summaries"], question_key: summary})
+        if cache is not None:
+            cache.put(key, entry)
+
+    text, source = summary
+    return entry["columns"], entry["rows"], entry["truncated"], text, source, cached and summary_cached
+
+
+def summarize(question: str, columns, rows, truncated=False, llm=None, mode=None):
+    """
+    (summary, source). In "template" answer mode, results with a common
+    shape (empty, a single aggregate, one row, a short list, a small
+    group-by table) are described without a second LLM call; everything
+    else, and every result in "llm" mode, goes to summarize_result.
+    """
+    if (mode or ANSWER_MODE) == "template":
+        text = template_summary(columns, rows, truncated)
+        if text is not None:
+            return text, "template"
+    return summarize_result(question, columns, rows, llm=llm, truncated=truncated), "llm"
+
+
+def summarize_result(question: str, columns, rows, llm=None, truncated=False):
+    # Token-budgeted table instead of the raw tuples
+    table_preview = compact_rows(columns, rows, truncated)
 
     prompt = f"""
 User Question: {question}
@@ -59,12 +215,7 @@ SQL Result:
 Provide a short natural language summary.
 """
 
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=prompt
-    )
-
-    return response.text.strip()
+    return call_llm(prompt, llm).strip()
 
 #Main pipeline
 def run():
@@ -76,7 +227,9 @@ def run():
     schema = load_schema(DB_PATH)
 
     print("\nGenerating SQL...")
-    sql = generate_sql(question, schema)
+    sql, from_cache = plan_sql(question, schema)
+    if from_cache:
+        print("(reused from plan cache)")
 
     print("\nGenerated SQL:")
     print(sql)
@@ -86,45 +239,72 @@ def run():
         return
 
     print("\nExecuting SQL...")
-    columns, rows = execute_sql(sql)
-
     print("\nRaw Results:")
-    for row in rows:
-        print(row)
+    columns, rows = [], []
+    try:
+        for columns, page in stream_sql(sql):
+            for row in page:
+                print(row)
+            rows.extend(page)
+    except (SQLRejectedError, SQLTimeoutError, sqlite3.Error) as e:
+        if from_cache:
+            forget_plan(schema, sql)
+        print(f"\n{e}")
+        return
+    if not from_cache:
+        remember_plan(question, schema, sql)
 
     print("\nSummarizing...")
-    summary = summarize_result(question, columns, rows)
+    summary, _ = summarize(question, columns, rows)
 
     print("\nFinal Answer:")
     print(summary)
 
 #---for capstone helper----
 
-def query_sql(question):
+def query_sql(question, llm=None, plan_cache=None, result_cache=None, answer_mode=None):
     """
     Capstone helper for /ask-sql
     Returns: {"answer": str, "confidence": float}
+    `llm` (prompt -> text) and the caches can be swapped for offline tests.
+    `answer_mode` ("llm" / "template") overrides SQL_ANSWER_MODE.
     """
     schema = load_schema(DB_PATH)
-    sql = generate_sql(question, schema)
+    try:
+        sql, from_cache = plan_sql(question, schema, llm=llm, cache=plan_cache)
+    except LLMError as e:
+        return {"answer": f"The language model is unavailable right now ({e}).", "confidence": 0.0}
 
     if not validate_sql(sql):
         return {"answer": "Unsafe SQL detected. Cannot execute.", "confidence": 0.0}
 
-    columns, rows = execute_sql(sql)
-    if rows:
-    # Create a pretty table using pandas
-        df = pd.DataFrame(rows, columns=columns)
-        table_preview = df.to_string(index=False)
-    else:
-        table_preview = "No results found."
-
-    summary = summarize_result(question, columns, rows)
+    try:
+        columns, rows, truncated, summary, summary_source, result_cached = run_cached(
+            question, sql, llm=llm, cache=result_cache, answer_mode=answer_mode)
+    except (SQLTimeoutError, SQLRejectedError, sqlite3.Error) as e:
+        # Bad SQL must not be replayed from the plan cache
+        if from_cache:
+            forget_plan(schema, sql, plan_cache)
+        return {"answer": f"{e}. Try a narrower question.", "confidence": 0.0}
+    except LLMError as e:
+        # The query itself ran; only the summary failed
+        if not from_cache:
+            remember_plan(question, schema, sql, plan_cache)
+        return {"answer": f"The language model is unavailable right now ({e}).", "confidence": 0.0, "sql": sql}
+
+    if not from_cache:
+        remember_plan(question, schema, sql, plan_cache)
+
+    table_preview = format_table(columns, rows)
+    if truncated:
+        table_preview += f"\n(first {len(rows)} rows shown)"
 
     # Simple confidence heuristic: if fewer than 5 rows, reduce confidence
     confidence = 0.9 if len(rows) >= 5 else 0.7
 
-    return {"Summary": summary, "answer": f"{table_preview}\n\n", "confidence": confidence}
+    return {"Summary": summary, "answer": f"{table_preview}\n\n", "confidence": confidence,
+            "sql": sql, "sql_cached": from_cache, "result_cached": result_cached, "summary_source": summary_source,
+            "columns": columns, "rows": [list(row) for row in rows], "truncated": truncated}
 
 if __name__ == "__main__":
     run()
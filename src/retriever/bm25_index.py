@@ -0,0 +1,190 @@
+import os
+import re
+import json
+from array import array
+from collections import Counter
+
+import numpy as np
+
+
+BM25_DIR = "src/data/vectorstore/bm25"
+
+# Same defaults as rank_bm25.BM25Okapi
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+# Longer tokens (URLs, hashes, table garbage) are dropped so the
+# fixed-width vocabulary array stays small
+MAX_TOKEN_BYTES = 40
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        encoded = token.encode("utf-8")
+        if len(encoded) <= MAX_TOKEN_BYTES:
+            tokens.append(encoded)
+    return tokens
+
+
+def build_bm25_index(texts, save_dir=BM25_DIR, ids=None, k1=K1, b=B, epsilon=EPSILON):
+    """
+    Build an inverted index (CSR, one row per term) with precomputed BM25
+    weights, so a query is just a sum of posting weights.
+
+    Files written to save_dir:
+      terms.npy    sorted vocabulary (bytes)
+      indptr.npy   postings of terms[i] are [indptr[i], indptr[i+1])
+      doc_ids.npy  chunk ID (or position when ids is None) for each posting
+      weights.npy  BM25 weight of the term in that chunk
+      meta.json    corpus stats
+    """
+    # texts/ids may be generators; postings are kept in compact typed arrays
+    vocab = {}
+    term_col, doc_col, tf_col = array("q"), array("q"), array("f")
+    doc_len = array("f")
+
+    for doc_id, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            term_col.append(vocab.setdefault(term, len(vocab)))
+            doc_col.append(doc_id)
+            tf_col.append(tf)
+
+    n_docs = len(doc_len)
+    term_col = np.frombuffer(term_col, dtype=np.int64) if term_col else np.empty(0, dtype=np.int64)
+    doc_col = np.frombuffer(doc_col, dtype=np.int64) if doc_col else np.empty(0, dtype=np.int64)
+    tf_col = np.frombuffer(tf_col, dtype=np.float32) if tf_col else np.empty(0, dtype=np.float32)
+    doc_len = np.frombuffer(doc_len, dtype=np.float32) if doc_len else np.empty(0, dtype=np.float32)
+
+    # IDF exactly as rank_bm25 computes it, including the epsilon floor
+    df = np.bincount(term_col, minlength=len(vocab)).astype(np.float64)
+    idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+    if len(idf):
+        idf[idf < 0] = epsilon * idf.mean()
+
+    avgdl = doc_len.mean() if n_docs else 0.0
+    norm = k1 * (1 - b + b * doc_len[doc_col] / max(avgdl, 1e-9))
+    weights = (idf[term_col] * tf_col * (k1 + 1) / (tf_col + norm)).astype(np.float32)
+
+    # Re-number terms alphabetically so lookups can use searchsorted
+    sorted_terms = sorted(vocab)
+    terms = np.array(sorted_terms, dtype=f"S{MAX_TOKEN_BYTES}")
+    rank = np.empty(len(vocab), dtype=np.int64)
+    rank[[vocab[t] for t in sorted_terms]] = np.arange(len(vocab))
+    term_rank = rank[term_col]
+
+    order = np.lexsort((doc_col, term_rank))
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_rank, minlength=len(vocab)), out=indptr[1:])
+
+    os.makedirs(save_dir, exist_ok=True)
+    np.save(os.path.join(save_dir, "terms.npy"), terms)
+    np.save(os.path.join(save_dir, "indptr.npy"), indptr)
+    # Postings point at chunk IDs so BM25 and FAISS hits share one key space
+    chunk_ids = doc_col if ids is None else np.fromiter(ids, dtype=np.int64, count=n_docs)[doc_col]
+    np.save(os.path.join(save_dir, "doc_ids.npy"), chunk_ids[order])
+    np.save(os.path.join(save_dir, "weights.npy"), weights[order])
+    with open(os.path.join(save_dir, "meta.json"), "w") as f:
+        json.dump({
+            "n_docs": n_docs,
+            "n_terms": len(vocab),
+            "n_postings": int(len(doc_col)),
+            "avgdl": float(avgdl),
+            "k1": k1,
+            "b": b,
+        }, f, indent=2)
+
+    return BM25Index(save_dir)
+
+
+def bm25_index_exists(save_dir=BM25_DIR):
+    return os.path.exists(os.path.join(save_dir, "meta.json"))
+
+
+class BM25Index:
+    """
+    Memory-mapped BM25 index. Only the postings of the query terms are read,
+    so resident memory stays small no matter how large the corpus is.
+    """
+    def __init__(self, save_dir=BM25_DIR):
+        with open(os.path.join(save_dir, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.n_docs = self.meta["n_docs"]
+
+        self.terms = np.load(os.path.join(save_dir, "terms.npy"), mmap_mode="r")
+        self.indptr = np.load(os.path.join(save_dir, "indptr.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(save_dir, "doc_ids.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(save_dir, "weights.npy"), mmap_mode="r")
+
+    def _term_id(self, token):
+        pos = int(np.searchsorted(self.terms, token))
+        if pos < len(self.terms) and self.terms[pos] == token:
+            return pos
+        return None
+
+    def score(self, query):
+        """Return (doc_ids, scores) for every chunk containing a query term."""
+        return self.score_many([query])[0]
+
+    def score_many(self, queries):
+        """
+        score() for several queries in one pass: all postings are gathered
+        into one array keyed by (query, doc) and summed with a single bincount.
+        Returns [(doc_ids, scores)] per query.
+        """
+        doc_parts, weight_parts, query_parts = [], [], []
+
+        # Repeated query terms count once per occurrence, like BM25Okapi
+        for qi, query in enumerate(queries):
+            for token in tokenize(query):
+                term_id = self._term_id(token)
+                if term_id is None:
+                    continue
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                doc_parts.append(self.doc_ids[start:end])
+                weight_parts.append(self.weights[start:end])
+                query_parts.append(np.full(end - start, qi, dtype=np.int64))
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not doc_parts:
+            return [empty for _ in queries]
+
+        docs = np.concatenate(doc_parts).astype(np.int64)
+        stride = int(docs.max()) + 1
+        keys = np.concatenate(query_parts) * stride + docs
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+
+        # unique_keys is sorted, so each query's docs are one contiguous run
+        bounds = np.searchsorted(unique_keys, np.arange(len(queries) + 1) * stride)
+        return [
+            (unique_keys[lo:hi] % stride, scores[lo:hi]) if hi > lo else empty
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def search(self, query, top_k, allowed_ids=None):
+        """Top-k chunk IDs by BM25 score, best first (only allowed_ids, if given)."""
+        return self.search_many([query], top_k, [allowed_ids])[0]
+
+    def search_many(self, queries, top_k, allowed_ids=None):
+        """search() for several queries; allowed_ids is one ID set (or None) per query."""
+        allowed_ids = allowed_ids or [None] * len(queries)
+        results = []
+        for (docs, scores), allowed in zip(self.score_many(queries), allowed_ids):
+            if allowed is not None and len(docs):
+                keep = np.isin(docs, allowed, assume_unique=True)
+                docs, scores = docs[keep], scores[keep]
+            if len(docs) == 0:
+                results.append((docs, scores))
+                continue
+
+            k = min(top_k, len(docs))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append((docs[top], scores[top]))
+        return results
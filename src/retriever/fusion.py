@@ -0,0 +1,49 @@
+import numpy as np
+
+
+# Standard RRF damping constant (Cormack et al.)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K, weights=None):
+    """
+    Fuse ranked ID lists (best first) by sum of weight / (k + rank).
+    Returns [(id, fused_score)] best first.
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    scores = {}
+    for ids, weight in zip(ranked_lists, weights):
+        for rank, doc_id in enumerate(ids):
+            doc_id = int(doc_id)
+            if doc_id < 0:
+                continue
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _normalize(scores, higher_is_better=True):
+    scores = np.asarray(scores, dtype=np.float64)
+    if not higher_is_better:
+        scores = -scores
+    span = scores.max() - scores.min() if len(scores) else 0.0
+    if span == 0:
+        return np.ones_like(scores)
+    return (scores - scores.min()) / span
+
+
+def weighted_score_fusion(hit_lists, weights=None):
+    """
+    Fuse (ids, scores, higher_is_better) hit lists by weighted min-max
+    normalized score. Returns [(id, fused_score)] best first.
+    """
+    weights = weights or [1.0] * len(hit_lists)
+    fused = {}
+    for (ids, scores, higher_is_better), weight in zip(hit_lists, weights):
+        if len(ids) == 0:
+            continue
+        for doc_id, score in zip(ids, _normalize(scores, higher_is_better)):
+            doc_id = int(doc_id)
+            if doc_id < 0:
+                continue
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * score
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -1,48 +1,137 @@
 import json
+
 import numpy as np
-import faiss
-from rank_bm25 import BM25Okapi
 
 from src.embeddings.embedder import Embedder
+from src.vectorstore.faiss_index import load_faiss_index, search_faiss_index_filtered, exact_search_subset
 from src.retriever.reranker import Reranker
+from src.retriever.bm25_index import BM25Index, BM25_DIR, bm25_index_exists, build_bm25_index
+from src.retriever.fusion import reciprocal_rank_fusion, weighted_score_fusion
+from src.retriever.metadata_index import MetadataIndex, METADATA_DIR, metadata_index_exists, build_metadata_index
+from src.utils.chunk_store import ChunkStore
+from src.utils.append_store import VectorFile
+from src.utils.resource_cache import get_resource
 
 
-CHUNKS_PATH = "src/data/chunks/chunks.json"
+CHUNKS_PATH = "src/data/chunks/chunks.db"
 INDEX_PATH = "src/data/vectorstore/index.faiss"
+EMBEDDINGS_PATH = "src/data/embeddings/embeddings.f32"
+
+
+# rrf: reciprocal-rank fusion | weighted: weighted min-max normalized scores
+FUSION_METHOD = "rrf"
+DENSE_WEIGHT = 1.0
+KEYWORD_WEIGHT = 1.0
+
+# Filters matching at most this many chunks are searched exactly over just
+# those vectors; larger sets go through the index with an ID selector
+EXACT_FILTER_MAX = 20_000
 
 
 class HybridRetriever:
-    def __init__(self, top_k=5):
+    def __init__(self, top_k=5, fusion=FUSION_METHOD):
         self.top_k = top_k
+        self.fusion = fusion
 
-        # Load chunks
-        with open(CHUNKS_PATH, "r") as f:
-            self.chunks = json.load(f)
+        # Chunks are fetched by the ID the indexes return, never loaded whole
+        self.chunks = ChunkStore(CHUNKS_PATH)
 
-        self.texts = [chunk["text"] for chunk in self.chunks]
+        # Load BM25 (built at ingest time; built once here for older indexes)
+        if bm25_index_exists(BM25_DIR):
+            self.bm25 = BM25Index(BM25_DIR)
+        else:
+            print("No BM25 index found. Building it once...")
+            self.bm25 = build_bm25_index(
+                (chunk["text"] for chunk in self.chunks.iter_chunks()), BM25_DIR,
+                ids=(chunk["id"] for chunk in self.chunks.iter_chunks())
+            )
 
-        # Build BM25
-        tokenized = [text.split() for text in self.texts]
-        self.bm25 = BM25Okapi(tokenized)
+        # Metadata ID sets, so filters narrow the search instead of its results
+        if metadata_index_exists(METADATA_DIR):
+            self.metadata = MetadataIndex(METADATA_DIR)
+        else:
+            print("No metadata index found. Building it once...")
+            self.metadata = build_metadata_index(self.chunks.iter_chunks(), METADATA_DIR)
 
         # Load FAISS
-        self.index = faiss.read_index(INDEX_PATH)
+        self.index = load_faiss_index(INDEX_PATH)
+
+        # Stored vectors (memmapped) for exact search inside small filtered sets
+        vector_file = VectorFile(EMBEDDINGS_PATH)
+        self.vector_ids, self.vectors = vector_file.load() if vector_file.exists() else (None, None)
+
+        # Load embedder (one instance per process, shared with the SQL plan cache;
+        # it doesn't change when the index is reloaded)
+        self.embedder = get_resource("embedder", Embedder)
+
+        # Reranker (shared too: a reload mustn't load another CrossEncoder and batching thread)
+        self.reranker = get_resource("reranker", Reranker)
+
+    def _dense_search(self, query_vecs, k, allowed_ids=None):
+        """Batched FAISS search for queries that share one allowed-ID set."""
+        if allowed_ids is None:
+            return self.index.search(query_vecs, k)
+        if len(allowed_ids) == 0:
+            empty = np.full((len(query_vecs), k), -1, dtype=np.int64)
+            return np.full(empty.shape, np.inf, dtype=np.float32), empty
+        if self.vectors is not None and len(allowed_ids) <= EXACT_FILTER_MAX:
+            return exact_search_subset(query_vecs, self.vector_ids, self.vectors, allowed_ids, k)
+
+        distances, indices = search_faiss_index_filtered(self.index, query_vecs, k, allowed_ids)
+        # HNSW can stop short when few neighbours pass the selector
+        if self.vectors is not None and ((indices >= 0).sum(axis=1) < min(k, len(allowed_ids))).any():
+            return exact_search_subset(query_vecs, self.vector_ids, self.vectors, allowed_ids, k)
+        return distances, indices
+
+    def dense_hits(self, query, top_k=None, allowed_ids=None):
+        """(chunk IDs, L2 distances), best first (only allowed_ids, if given)."""
+        return self.dense_hits_many([query], top_k, [allowed_ids])[0]
 
-        # Load embedder
-        self.embedder = Embedder()
+    def dense_hits_many(self, queries, top_k=None, allowed_ids=None):
+        """
+        dense_hits() for several queries: one embedding pass, then one FAISS
+        search per distinct allowed-ID set (one in total when unfiltered).
+        """
+        top_k = top_k or self.top_k
+        allowed_ids = allowed_ids or [None] * len(queries)
+        query_vecs = self.embedder.embed(queries)
 
-        # Reranker
-        self.reranker = Reranker()
+        groups = {}
+        for i, allowed in enumerate(allowed_ids):
+            groups.setdefault(id(allowed), (allowed, []))[1].append(i)
 
-    def dense_search(self, query):
-        query_vec = self.embedder.embed([query])
-        _, indices = self.index.search(query_vec, self.top_k * 3)
-        return indices[0]
+        hits = [None] * len(queries)
+        for allowed, rows in groups.values():
+            distances, indices = self._dense_search(query_vecs[rows], top_k * 3, allowed)
+            for row, dist, idx in zip(rows, distances, indices):
+                keep = idx >= 0
+                hits[row] = (idx[keep], dist[keep])
+        return hits
 
-    def keyword_search(self, query):
-        scores = self.bm25.get_scores(query.split())
-        top_indices = np.argsort(scores)[::-1][: self.top_k * 3]
-        return top_indices
+    def keyword_hits(self, query, top_k=None, allowed_ids=None):
+        """(chunk IDs, BM25 scores), best first (only allowed_ids, if given)."""
+        return self.keyword_hits_many([query], top_k, [allowed_ids])[0]
+
+    def keyword_hits_many(self, queries, top_k=None, allowed_ids=None):
+        top_k = top_k or self.top_k
+        return self.bm25.search_many(queries, top_k * 3, allowed_ids)
+
+    def dense_search(self, query, top_k=None):
+        return self.dense_hits(query, top_k)[0]
+
+    def keyword_search(self, query, top_k=None):
+        return self.keyword_hits(query, top_k)[0]
+
+    def fuse(self, dense, keyword):
+        """Fused chunk IDs, best first."""
+        if self.fusion == "weighted":
+            fused = weighted_score_fusion(
+                [(dense[0], dense[1], False), (keyword[0], keyword[1], True)],
+                weights=[DENSE_WEIGHT, KEYWORD_WEIGHT]
+            )
+        else:
+            fused = reciprocal_rank_fusion([dense[0], keyword[0]], weights=[DENSE_WEIGHT, KEYWORD_WEIGHT])
+        return [doc_id for doc_id, _ in fused]
     
     def apply_filters(self, candidates, filters=None):
         if not filters:
@@ -64,46 +153,85 @@ class HybridRetriever:
         return filtered
 
 
-    def retrieve(self, query, filters=None):
-        dense_indices = self.dense_search(query)
-        keyword_indices = self.keyword_search(query)
+    def allowed_ids_for(self, filters_list):
+        """
+        Split each query's filters into an allowed-ID set (indexed fields)
+        and residual filters checked on the fetched chunks. Queries with the
+        same indexed filters share one ID set.
+        """
+        allowed_list, residual_list, cache = [], [], {}
+        for filters in filters_list:
+            allowed, residual = None, filters
+            if filters:
+                indexed, residual = self.metadata.split_filters(filters)
+                if indexed:
+                    key = json.dumps(indexed, sort_keys=True, default=str)
+                    if key not in cache:
+                        cache[key] = self.metadata.ids_for(indexed)
+                    allowed = cache[key]
+            allowed_list.append(allowed)
+            residual_list.append(residual)
+        return allowed_list, residual_list
 
-        # Merge
-        combined = list(set(dense_indices.tolist() + keyword_indices.tolist()))
-        candidates = [self.chunks[i] for i in combined]
+    def retrieve(self, query, filters=None, top_k=None):
+        return self.retrieve_many([query], filters, top_k)[0]
 
-        # Apply Metadata Filters (STEP 3)
-        candidates = self.apply_filters(candidates, filters)
+    def retrieve_many(self, queries, filters=None, top_k=None):
+        """
+        retrieve() for a list of queries. filters is one dict for all queries
+        or a list with one dict (or None) per query. Queries are embedded in
+        one pass, searched in batches, and their rerank pairs share
+        CrossEncoder batches. Returns one result list per query.
+        """
+        top_k = top_k or self.top_k
+        queries = list(queries)
+        if not queries:
+            return []
+        filters_list = filters if isinstance(filters, list) else [filters] * len(queries)
 
-        # KEYWORD FALLBACK
-        if not candidates:
-            print("No results after filtering. Falling back to keyword search...")
-            fallback_indices = self.keyword_search(query)
-            candidates = [self.chunks[i] for i in fallback_indices]
+        # Indexed filters become an allowed-ID set for both searches;
+        # anything else is still checked on the fetched chunks
+        allowed_list, residual_list = self.allowed_ids_for(filters_list)
 
-        # Rerank
-        reranked = self.reranker.rerank(query, candidates)
+        dense = self.dense_hits_many(queries, top_k, allowed_list)
+        keyword = self.keyword_hits_many(queries, top_k, allowed_list)
 
-        # Deduplicate
-        seen = set()
-        final = []
-        for chunk in reranked:
-            text_hash = hash(chunk["text"])
-            if text_hash not in seen:
-                seen.add(text_hash)
-                final.append(chunk)
+        # Merge, keeping rank order; fetch every query's chunks in one go
+        combined = [self.fuse(d, k) for d, k in zip(dense, keyword)]
+        chunk_by_id = {chunk["id"]: chunk for chunk in self.chunks.get_many(
+            list(dict.fromkeys(doc_id for ids in combined for doc_id in ids))
+        )}
 
-        return final[: self.top_k]
-    
-# ---------------- Capstone helper ----------------
-def query_hybrid_text(query, top_k=5, filters=None):
-    """
-    Helper function for Capstone text RAG.
-    Returns {"answer": str, "confidence": float}
-    """
-    retriever = HybridRetriever(top_k=top_k)
-    results = retriever.retrieve(query, filters)
+        unique_lists = []
+        for query, ids, allowed, residual in zip(queries, combined, allowed_list, residual_list):
+            candidates = [chunk_by_id[i] for i in ids if i in chunk_by_id]
+
+            # Apply Metadata Filters (STEP 3)
+            candidates = self.apply_filters(candidates, residual)
+
+            # KEYWORD FALLBACK (still within the filters; nothing matches an empty allowed set)
+            if not candidates and (allowed is None or len(allowed) > 0):
+                print("No results after filtering. Falling back to keyword search...")
+                fallback_indices = self.keyword_hits(query, top_k, allowed)[0]
+                candidates = self.apply_filters(self.chunks.get_many(fallback_indices), residual)
+
+            # Deduplicate (before reranking, so duplicates don't use up the budget)
+            seen = set()
+            unique = []
+            for chunk in candidates:
+                text_hash = hash(chunk["text"])
+                if text_hash not in seen:
+                    seen.add(text_hash)
+                    unique.append(chunk)
+            unique_lists.append(unique)
 
+        # Rerank only the head of each fused list, all queries together
+        reranked = self.reranker.rerank_head_many(queries, unique_lists, top_k)
+
+        return [results[:top_k] for results in reranked]
+
+# ---------------- Capstone helper ----------------
+def _answer(results, top_k):
     if not results:
         return {"answer": "No relevant documents found.", "confidence": 0.0}
 
@@ -113,6 +241,27 @@ def query_hybrid_text(query, top_k=5, filters=None):
     confidence = min(1.0, len(results)/top_k)
     return {"answer": answer, "confidence": confidence}
 
+
+def query_hybrid_text(query, top_k=5, filters=None):
+    """
+    Helper function for Capstone text RAG.
+    Returns {"answer": str, "confidence": float}
+    """
+    # Shared, already-loaded retriever (see retriever_registry)
+    from src.retriever.retriever_registry import get_retriever
+
+    retriever = get_retriever()
+    results = retriever.retrieve(query, filters, top_k=top_k)
+    return _answer(results, top_k)
+
+
+def query_hybrid_text_many(queries, top_k=5, filters=None):
+    """query_hybrid_text() for a list of queries, retrieved as one batch."""
+    from src.retriever.retriever_registry import get_retriever
+
+    retriever = get_retriever()
+    return [_answer(results, top_k) for results in retriever.retrieve_many(queries, filters, top_k=top_k)]
+
 if __name__ == "__main__":
     retriever = HybridRetriever(top_k=5)
     query = "Explain how executive compensation works"
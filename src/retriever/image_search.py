@@ -1,14 +1,13 @@
 import sys
 from pathlib import Path
-import chromadb
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from src.embeddings.clip_embedder import CLIPEmbedder
+from src.pipelines.image_ingest import get_clip_embedder, get_chroma_client
 
 class ImageSearchEngine:
     def __init__(self, vector_store_dir="vectorstore"):
-        self.embedder = CLIPEmbedder()
-        self.client = chromadb.PersistentClient(path=vector_store_dir)
+        self.embedder = get_clip_embedder()
+        self.client = get_chroma_client(vector_store_dir)
         self.collection = self.client.get_collection("image_rag")
         print(f"Search engine ready. Total docs: {self.collection.count()}")
 
@@ -0,0 +1,83 @@
+import os
+import json
+from array import array
+
+import numpy as np
+
+
+METADATA_DIR = "src/data/vectorstore/metadata"
+INDEXED_FIELDS = ("source", "year", "type", "page")
+
+
+def _key(value):
+    # Filters may say {"page": "3"} or {"page": 3}; index both the same way
+    return str(value)
+
+
+def build_metadata_index(chunks, save_dir=METADATA_DIR, fields=INDEXED_FIELDS):
+    """
+    Build per-field postings: for every value of every field, the sorted
+    chunk IDs that have it. Each field is one concatenated ids array
+    (<field>.npy) plus {value: [start, end]} offsets in index.json.
+    """
+    postings = {field: {} for field in fields}
+    n_chunks = 0
+    for chunk in chunks:
+        n_chunks += 1
+        metadata = chunk["metadata"]
+        for field in fields:
+            if metadata.get(field) is not None:
+                postings[field].setdefault(_key(metadata[field]), array("q")).append(chunk["id"])
+
+    os.makedirs(save_dir, exist_ok=True)
+    offsets = {}
+    for field, values in postings.items():
+        parts, offsets[field], start = [], {}, 0
+        for value in sorted(values):
+            ids = np.sort(np.frombuffer(values[value], dtype=np.int64))
+            parts.append(ids)
+            offsets[field][value] = [start, start + len(ids)]
+            start += len(ids)
+        all_ids = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        np.save(os.path.join(save_dir, f"{field}.npy"), all_ids)
+
+    with open(os.path.join(save_dir, "index.json"), "w") as f:
+        json.dump({"n_chunks": n_chunks, "fields": offsets}, f, indent=2)
+
+    return MetadataIndex(save_dir)
+
+
+def metadata_index_exists(save_dir=METADATA_DIR):
+    return os.path.exists(os.path.join(save_dir, "index.json"))
+
+
+class MetadataIndex:
+    """Memory-mapped ID sets per metadata value, for filtering before search."""
+    def __init__(self, save_dir=METADATA_DIR):
+        with open(os.path.join(save_dir, "index.json"), "r") as f:
+            meta = json.load(f)
+        self.n_chunks = meta["n_chunks"]
+        self.offsets = meta["fields"]
+        self.ids = {
+            field: np.load(os.path.join(save_dir, f"{field}.npy"), mmap_mode="r")
+            for field in self.offsets
+        }
+
+    def split_filters(self, filters):
+        """(filters this index can answer, the rest)."""
+        indexed = {k: v for k, v in filters.items() if k in self.offsets}
+        residual = {k: v for k, v in filters.items() if k not in self.offsets}
+        return indexed, residual
+
+    def ids_for(self, filters):
+        """Sorted chunk IDs matching every indexed filter (AND)."""
+        result = None
+        for field, value in filters.items():
+            span = self.offsets[field].get(_key(value))
+            if span is None:
+                return np.empty(0, dtype=np.int64)
+            ids = self.ids[field][span[0]:span[1]]
+            result = np.asarray(ids) if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
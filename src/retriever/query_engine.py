@@ -1,12 +1,13 @@
-import json
 import numpy as np
-import faiss
 
 from src.embeddings.embedder import Embedder
+from src.utils.resource_cache import get_resource
+from src.vectorstore.faiss_index import load_faiss_index
+from src.utils.chunk_store import ChunkStore
 
 
-CHUNKS_PATH = "src/data/chunks/chunks.json"
-EMBEDDINGS_PATH = "src/data/embeddings/embeddings.npy"
+CHUNKS_PATH = "src/data/chunks/chunks.db"
+EMBEDDINGS_PATH = "src/data/embeddings/embeddings.f32"
 INDEX_PATH = "src/data/vectorstore/index.faiss"
 
 
@@ -15,14 +16,13 @@ class QueryEngine:
         self.top_k = top_k
 
         print("Loading chunks...")
-        with open(CHUNKS_PATH, "r") as f:
-            self.chunks = json.load(f)
+        self.chunks = ChunkStore(CHUNKS_PATH)
 
         print("Loading FAISS index...")
-        self.index = faiss.read_index(INDEX_PATH)
+        self.index = load_faiss_index(INDEX_PATH)
 
         print("Loading embedding model...")
-        self.embedder = Embedder()
+        self.embedder = get_resource("embedder", Embedder)
 
     def search(self, query: str):
         print(f"\nQuery: {query}")
@@ -31,11 +31,17 @@ class QueryEngine:
 
         distances, indices = self.index.search(query_embedding, self.top_k)
 
-        results = []
-        for idx in indices[0]:
-            results.append(self.chunks[idx])
+        # -1 pads the result when the index holds fewer than top_k vectors;
+        # get_many skips it
+        return self.chunks.get_many(indices[0])
 
-        return results
+    def search_many(self, queries):
+        """search() for a list of queries: one embedding pass, one FAISS search."""
+        query_embeddings = self.embedder.embed(list(queries))
+        distances, indices = self.index.search(query_embeddings, self.top_k)
+
+        chunk_by_id = {chunk["id"]: chunk for chunk in self.chunks.get_many(np.unique(indices))}
+        return [[chunk_by_id[i] for i in row if i in chunk_by_id] for row in indices.tolist()]
 
 
 if __name__ == "__main__":
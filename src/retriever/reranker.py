@@ -1,15 +1,107 @@
+import os
+
 from sentence_transformers import CrossEncoder
 
+from src.utils.inference_config import (
+    optimize_for_inference, inference_mode, cpu_device_for, model_tag, RERANK_BATCH_SIZE
+)
+from src.utils.batch_scheduler import BatchScheduler, concat_batch, MICRO_BATCH
+
+# At most this many fused candidates go through the CrossEncoder per query,
+# scored RERANK_BLOCK at a time until the top-k stops changing
+RERANK_BUDGET = int(os.getenv("RERANK_BUDGET", "20"))
+RERANK_BLOCK = int(os.getenv("RERANK_BLOCK", "8"))
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
 
 class Reranker:
-    def __init__(self):
-        self.model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+    def __init__(self, quantize=None, batch_size=RERANK_BATCH_SIZE, micro_batch=MICRO_BATCH):
+        self.model = CrossEncoder(RERANK_MODEL, device=cpu_device_for(quantize))
+        self.model.model = optimize_for_inference(self.model.model, quantize)
+        self.batch_size = batch_size
+
+        # Pairs from concurrent requests are scored in one predict() call
+        self.scheduler = BatchScheduler(
+            self._predict_batch, name=f"rerank:{model_tag(RERANK_MODEL, quantize)}"
+        ) if micro_batch else None
+
+    def _predict_batch(self, items):
+        return concat_batch(self._predict, items)
+
+    def score(self, query, candidates):
+        return self.score_pairs([(query, chunk["text"]) for chunk in candidates])
 
     def rerank(self, query, candidates):
-        pairs = [(query, chunk["text"]) for chunk in candidates]
-        scores = self.model.predict(pairs)
+        scores = self.score(query, candidates)
 
         scored = list(zip(candidates, scores))
         scored.sort(key=lambda x: x[1], reverse=True)
 
         return [item[0] for item in scored]
+
+    def score_pairs(self, pairs):
+        """CrossEncoder scores for (query, text) pairs, batched together."""
+        if not pairs:
+            return []
+        if self.scheduler is not None:
+            return self.scheduler(pairs)
+        return self._predict(pairs)
+
+    def close(self):
+        """Stop the micro-batching thread (scoring keeps working, unbatched)."""
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+
+    def _predict(self, pairs):
+        with inference_mode():
+            return self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+
+    def rerank_head(self, query, candidates, top_k, budget=RERANK_BUDGET, block_size=RERANK_BLOCK):
+        """
+        Rerank only the first `budget` candidates (already in fused order).
+        Scoring goes block by block and stops early once a block leaves the
+        top-k unchanged. Unscored candidates keep their fused order after the
+        reranked ones.
+        """
+        return self.rerank_head_many([query], [candidates], top_k, budget, block_size)[0]
+
+    def rerank_head_many(self, queries, candidate_lists, top_k, budget=RERANK_BUDGET, block_size=RERANK_BLOCK):
+        """
+        rerank_head() for several queries in lockstep: each round, the next
+        block of every query that hasn't settled yet goes into one shared
+        CrossEncoder call.
+        """
+        heads = [candidates[:budget] for candidates in candidate_lists]
+        scored = [[] for _ in queries]
+        previous_top = [None] * len(queries)
+        active = [i for i, head in enumerate(heads) if head]
+
+        while active:
+            pairs, owners = [], []
+            for i in active:
+                start = len(scored[i])
+                # First block covers the whole top-k so there is something to compare
+                size = max(block_size, top_k) if start == 0 else block_size
+                block = heads[i][start:start + size]
+                pairs.extend((queries[i], chunk["text"]) for chunk in block)
+                owners.extend((i, chunk) for chunk in block)
+
+            for (i, chunk), score in zip(owners, self.score_pairs(pairs)):
+                scored[i].append((chunk, score))
+
+            still_active = []
+            for i in active:
+                ranked = sorted(scored[i], key=lambda x: x[1], reverse=True)
+                top = [id(chunk) for chunk, _ in ranked[:top_k]]
+                if top != previous_top[i] and len(scored[i]) < len(heads[i]):
+                    still_active.append(i)
+                previous_top[i] = top
+            active = still_active
+
+        results = []
+        for candidates, pairs in zip(candidate_lists, scored):
+            ranked = sorted(pairs, key=lambda x: x[1], reverse=True)
+            results.append([chunk for chunk, _ in ranked] + candidates[len(pairs):])
+        return results
@@ -0,0 +1,106 @@
+import os
+import threading
+
+from src.retriever.hybrid_retriever import HybridRetriever, CHUNKS_PATH, INDEX_PATH
+from src.retriever.bm25_index import BM25_DIR
+from src.retriever.metadata_index import METADATA_DIR
+
+
+def index_version(paths=(CHUNKS_PATH, INDEX_PATH, os.path.join(BM25_DIR, "meta.json"),
+                         os.path.join(METADATA_DIR, "index.json"))):
+    """
+    Cheap version stamp for the on-disk index: (mtime_ns, size) of every file.
+    Changes whenever ingest rewrites one of them.
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+class RetrieverRegistry:
+    """
+    Process-wide holder for a warm HybridRetriever.
+    Chunks, BM25, FAISS and both models are loaded once and shared by every
+    caller; the retriever is rebuilt only when the index version changes.
+    """
+    def __init__(self, factory=HybridRetriever, version_fn=index_version):
+        self.factory = factory
+        self.version_fn = version_fn
+        self._retriever = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def get(self):
+        version = self.version_fn()
+        retriever = self._retriever
+        if retriever is not None and version == self._version:
+            return retriever
+
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            if self._retriever is not None and version == self._version:
+                return self._retriever
+
+            if self._retriever is None:
+                print("Loading hybrid retriever...")
+            else:
+                print("Index changed on disk. Reloading hybrid retriever...")
+
+            self._retriever = self.factory()
+            self._version = version
+            return self._retriever
+
+    def warm_up(self, background=True):
+        """Load everything ahead of the first query. Safe to call repeatedly."""
+        if not background:
+            return self.get()
+
+        with self._lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return self._warmup_thread
+            if self._retriever is not None:
+                return None
+            self._warmup_thread = threading.Thread(
+                target=self._warm_up_quietly, name="retriever-warmup", daemon=True
+            )
+            self._warmup_thread.start()
+            return self._warmup_thread
+
+    def _warm_up_quietly(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f"Retriever warm-up failed: {e}")
+
+    def is_loaded(self):
+        return self._retriever is not None
+
+    def clear(self):
+        with self._lock:
+            self._retriever = None
+            self._version = None
+
+
+_registry = RetrieverRegistry()
+
+
+def get_retriever():
+    return _registry.get()
+
+
+def warm_up(background=True):
+    return _registry.warm_up(background=background)
+
+
+def retriever_loaded():
+    return _registry.is_loaded()
+
+
+def clear_retriever():
+    _registry.clear()
@@ -0,0 +1,89 @@
+import os
+import json
+import numpy as np
+
+
+class VectorFile:
+    """
+    Append-only float32 matrix on disk (`<path>`), with the chunk ID of each
+    row in `<path>.ids` and the dimension in `<path>.json`. Read back as a
+    memmap, so nothing is loaded until it's touched.
+    """
+    def __init__(self, path, dim=None):
+        self.path = path
+        self.ids_path = path + ".ids"
+        self.meta_path = path + ".json"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                dim = json.load(f)["dim"]
+        self.dim = dim
+        self._f = None
+        self._ids_f = None
+
+    def exists(self):
+        return os.path.exists(self.meta_path)
+
+    def rows(self):
+        if not self.dim or not os.path.exists(self.ids_path):
+            return 0
+        return os.path.getsize(self.ids_path) // 8
+
+    def append(self, ids, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if not os.path.exists(self.meta_path):
+            with open(self.meta_path, "w") as f:
+                json.dump({"dim": self.dim}, f)
+        if self._f is None:
+            self._f = open(self.path, "ab")
+            self._ids_f = open(self.ids_path, "ab")
+        self._f.write(vectors.tobytes())
+        self._ids_f.write(np.asarray(ids, dtype=np.int64).tobytes())
+
+    def sync(self):
+        for f in (self._f, self._ids_f):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+        return self.rows()
+
+    def close(self):
+        for f in (self._f, self._ids_f):
+            if f is not None:
+                f.close()
+        self._f = self._ids_f = None
+
+    def truncate(self, rows):
+        self.close()
+        if self.dim and self.rows() > rows:
+            os.truncate(self.path, rows * self.dim * 4)
+            os.truncate(self.ids_path, rows * 8)
+
+    def load(self):
+        """(ids, vectors) as read-only memmaps."""
+        n = self.rows()
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32)
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(n,))
+        vectors = np.memmap(self.path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return ids, vectors
+
+    def compact(self, drop_ids, batch_size=65536):
+        """Rewrite without the rows whose ID is in drop_ids, one batch at a time."""
+        self.close()
+        ids, vectors = self.load()
+        drop = np.asarray(sorted(drop_ids), dtype=np.int64)
+        tmp_path, tmp_ids_path = self.path + ".tmp", self.ids_path + ".tmp"
+        with open(tmp_path, "wb") as out, open(tmp_ids_path, "wb") as out_ids:
+            for start in range(0, len(ids), batch_size):
+                batch_ids = np.asarray(ids[start:start + batch_size])
+                keep = ~np.isin(batch_ids, drop)
+                out.write(np.ascontiguousarray(vectors[start:start + batch_size][keep]).tobytes())
+                out_ids.write(batch_ids[keep].tobytes())
+        del ids, vectors
+        os.replace(tmp_path, self.path)
+        os.replace(tmp_ids_path, self.ids_path)
+        return self.rows()
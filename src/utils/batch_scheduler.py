@@ -0,0 +1,205 @@
+import os
+import queue
+import inspect
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+
+# INFERENCE_MICRO_BATCH       1 = group concurrent model calls into shared batches
+# MICRO_BATCH_MAX_SIZE        most requests merged into one model call
+# MICRO_BATCH_MAX_WAIT_MS     how long the first request of a batch waits for company
+MICRO_BATCH = os.getenv("INFERENCE_MICRO_BATCH", "1") == "1"
+MAX_BATCH_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+# Queued by close() to wake the worker up
+_STOP = object()
+
+
+class BatchScheduler:
+    """
+    Collects requests from many threads and runs them through `batch_fn`
+    together. batch_fn takes a list of request items and returns one result
+    per item, in order. submit() returns a Future per request.
+
+    A batch is closed when it has max_batch_size requests or when its first
+    request has waited max_wait_ms, whichever comes first. The wait only
+    applies while there is concurrent traffic (the previous batch had more
+    than one request); a lone caller is run straight away. Requests that
+    queue up while a batch is running join the next one either way.
+
+    When batch_fn is a bound method, the scheduler only keeps a weak
+    reference to its object (the model that owns the scheduler), so the
+    model can still be garbage-collected; the worker thread is then closed.
+    """
+    def __init__(self, batch_fn, name, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        if inspect.ismethod(batch_fn):
+            self._batch_ref = weakref.WeakMethod(batch_fn)
+            weakref.finalize(batch_fn.__self__, self.close)
+        else:
+            self._batch_ref = lambda: batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._batch_sizes = Counter()
+        self._last_batch_size = 0
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self._worker.start()
+        with _schedulers_lock:
+            _schedulers[id(self)] = self
+
+    def batch_fn(self, items):
+        fn = self._batch_ref()
+        if fn is None:
+            raise ReferenceError(f"batch scheduler {self.name}: its model was garbage-collected")
+        return fn(items)
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        """Submit one request and wait for its result."""
+        if self._closed or threading.current_thread() is self._worker:
+            # Called from inside batch_fn: run directly instead of deadlocking
+            return self.batch_fn([item])[0]
+        return self.submit(item).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = first[2] + wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(block=timeout > 0, timeout=max(timeout, 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch first; the next _collect() sees the stop
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            self._last_batch_size = len(batch)
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                errors = 0
+            except Exception:
+                # One bad request (e.g. an unreadable image) shouldn't fail
+                # the others, so retry each request on its own
+                errors = self._run_one_by_one(batch)
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._errors += errors
+                self._wait_total += sum(started - queued for _, _, queued in batch)
+                self._run_total += finished - started
+                self._batch_sizes[len(batch)] += 1
+
+    def close(self, timeout=5.0):
+        """
+        Stop the worker thread once the queued requests are done and drop the
+        scheduler from scheduler_stats(). Later calls run batch_fn directly.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        # The owner can be collected (and close() called) on the worker thread itself
+        if threading.current_thread() is not self._worker:
+            self._worker.join(timeout)
+        # Requests submitted after the stop marker would wait forever otherwise
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._run_one_by_one(leftover)
+        with _schedulers_lock:
+            _schedulers.pop(id(self), None)
+
+    def _run_one_by_one(self, batch):
+        errors = 0
+        for item, future, _ in batch:
+            try:
+                future.set_result(self.batch_fn([item])[0])
+            except Exception as e:
+                future.set_exception(e)
+                errors += 1
+        return errors
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "requests": self._requests,
+                "batches": batches,
+                "errors": self._errors,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": self._requests / batches if batches else 0.0,
+                "max_batch_size": max(self._batch_sizes) if self._batch_sizes else 0,
+                "avg_queue_wait_ms": self._wait_total / self._requests * 1000 if self._requests else 0.0,
+                "avg_batch_run_ms": self._run_total / batches * 1000 if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            }
+
+
+def scheduler_stats():
+    """stats() of every scheduler in the process, by name ("name#2", ... for repeated names)."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    stats, seen = {}, Counter()
+    for scheduler in schedulers:
+        seen[scheduler.name] += 1
+        key = scheduler.name if seen[scheduler.name] == 1 else f"{scheduler.name}#{seen[scheduler.name]}"
+        stats[key] = scheduler.stats()
+    return stats
+
+
+def concat_batch(run, items):
+    """
+    batch_fn helper for requests that are lists themselves (texts, pairs):
+    runs `run` once on all of them concatenated and splits the output back.
+    """
+    flat = [x for item in items for x in item]
+    output = run(flat)
+    results, start = [], 0
+    for item in items:
+        results.append(output[start:start + len(item)])
+        start += len(item)
+    return results
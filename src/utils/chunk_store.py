@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+
+
+CHUNK_COLUMNS = ("id", "text", "source", "page", "year", "type", "chunk_id")
+
+# Let SQLite serve reads straight from the page cache
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Stay under SQLite's bound-parameter limit
+MAX_PARAMS = 900
+
+
+def _row_to_chunk(row):
+    chunk_id, text, source, page, year, doc_type, local_id = row
+    return {
+        "id": chunk_id,
+        "text": text,
+        "metadata": {
+            "source": source,
+            "page": page,
+            "year": year,
+            "type": doc_type,
+            "chunk_id": local_id,
+        },
+    }
+
+
+class ChunkStore:
+    """
+    SQLite table of chunks keyed by vector ID (the ID FAISS and BM25 return).
+    Opening it costs nothing; chunks are read by primary key on demand, so
+    memory scales with the chunks actually fetched, not the corpus.
+    """
+    def __init__(self, db_path, readonly=True):
+        self.db_path = db_path
+        self.readonly = readonly
+        self._local = threading.local()
+        if not readonly:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id INTEGER PRIMARY KEY, text TEXT NOT NULL, source TEXT, page INTEGER, "
+                "year TEXT, type TEXT, chunk_id INTEGER)"
+            )
+            self._conn().commit()
+
+    def _conn(self):
+        # One connection per thread; the app serves queries from several
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __contains__(self, chunk_id):
+        row = self._conn().execute("SELECT 1 FROM chunks WHERE id = ?", (int(chunk_id),)).fetchone()
+        return row is not None
+
+    def get(self, chunk_id):
+        row = self._conn().execute(
+            f"SELECT {', '.join(CHUNK_COLUMNS)} FROM chunks WHERE id = ?", (int(chunk_id),)
+        ).fetchone()
+        return _row_to_chunk(row) if row else None
+
+    def get_many(self, chunk_ids):
+        """Chunks for chunk_ids, in the same order; unknown IDs (e.g. FAISS -1) are skipped."""
+        chunk_ids = [int(i) for i in chunk_ids if i >= 0]
+        by_id = {}
+        for start in range(0, len(chunk_ids), MAX_PARAMS):
+            batch = chunk_ids[start:start + MAX_PARAMS]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self._conn().execute(
+                f"SELECT {', '.join(CHUNK_COLUMNS)} FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall()
+            by_id.update((row[0], _row_to_chunk(row)) for row in rows)
+        return [by_id[i] for i in chunk_ids if i in by_id]
+
+    def iter_chunks(self, batch_size=1000):
+        """Every chunk in ID order, fetched in pages."""
+        last_id = -1
+        while True:
+            rows = self._conn().execute(
+                f"SELECT {', '.join(CHUNK_COLUMNS)} FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _row_to_chunk(row)
+            last_id = rows[-1][0]
+
+    # ---------------- Writes (ingest only) ----------------
+    def append(self, chunks):
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    chunk["id"], chunk["text"],
+                    chunk["metadata"].get("source"), chunk["metadata"].get("page"),
+                    chunk["metadata"].get("year"), chunk["metadata"].get("type"),
+                    chunk["metadata"].get("chunk_id"),
+                )
+                for chunk in chunks
+            ]
+        )
+
+    def sync(self):
+        self._conn().commit()
+
+    def delete(self, chunk_ids):
+        self._conn().executemany("DELETE FROM chunks WHERE id = ?", [(int(i),) for i in chunk_ids])
+        self._conn().commit()
+
+    def truncate(self, next_id):
+        """Drop chunks at or above next_id (written after the last checkpoint)."""
+        self._conn().execute("DELETE FROM chunks WHERE id >= ?", (int(next_id),))
+        self._conn().commit()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
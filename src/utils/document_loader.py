@@ -2,7 +2,8 @@ import os
 from pypdf import PdfReader
 
 
-def load_pdf(file_path: str):
+def load_pdf(file_path: str, page_range=None):
+    """page_range: optional (start, end) to read only pages[start:end]."""
     documents = []
 
     reader = PdfReader(file_path)
@@ -18,8 +19,9 @@ def load_pdf(file_path: str):
 
     # You can customize type detection logic later
     doc_type = "proxy_statement"
-    for page_number, page in enumerate(reader.pages):
-        text = page.extract_text()
+    start, end = page_range or (0, len(reader.pages))
+    for page_number in range(start, min(end, len(reader.pages))):
+        text = reader.pages[page_number].extract_text()
         if text:
             documents.append({
                 "text": text,
@@ -37,7 +39,7 @@ def load_pdf(file_path: str):
 def load_documents_from_folder(folder_path: str):
     all_docs = []
 
-    for file in os.listdir(folder_path):
+    for file in sorted(os.listdir(folder_path)):
         file_path = os.path.join(folder_path, file)
 
         if file.endswith(".pdf"):
@@ -45,3 +47,7 @@ def load_documents_from_folder(folder_path: str):
             all_docs.extend(docs)
 
     return all_docs
+
+
+def count_pages(file_path: str):
+    return len(PdfReader(file_path).pages)
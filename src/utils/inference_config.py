@@ -0,0 +1,71 @@
+import os
+import threading
+
+import torch
+
+# INFERENCE_QUANTIZE    none | int8 (dynamic int8 quantization of Linear layers)
+# INFERENCE_THREADS     intra-op threads per process (default: all cores)
+# INFERENCE_INTEROP     inter-op threads (default: 1; the app already runs requests in parallel)
+# RERANK_BATCH_SIZE     CrossEncoder batch size
+QUANTIZE = os.getenv("INFERENCE_QUANTIZE", "none").lower()
+NUM_THREADS = int(os.getenv("INFERENCE_THREADS", "0")) or os.cpu_count() or 1
+INTEROP_THREADS = int(os.getenv("INFERENCE_INTEROP", "1"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+QUANTIZE_MODES = ("none", "int8")
+
+_threads_applied = False
+_threads_lock = threading.Lock()
+
+
+def apply_thread_policy(num_threads=NUM_THREADS, interop_threads=INTEROP_THREADS):
+    """Set torch's thread pools once per process, before the first model runs."""
+    global _threads_applied
+    with _threads_lock:
+        if _threads_applied:
+            return
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Only allowed before any parallel work has started
+            pass
+        _threads_applied = True
+
+
+def resolve_quantize(quantize=None):
+    mode = (quantize or QUANTIZE).lower()
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantize mode '{mode}'. Choose from {QUANTIZE_MODES}")
+    return mode
+
+
+def optimize_for_inference(module, quantize=None):
+    """
+    Put a torch module in eval mode and, for int8, swap its Linear layers for
+    dynamically quantized ones (weights int8, activations quantized per batch).
+    Returns the module to use.
+    """
+    apply_thread_policy()
+    module.eval()
+    if resolve_quantize(quantize) == "int8":
+        # In place, so the fp32 weights aren't held twice while converting
+        module = torch.ao.quantization.quantize_dynamic(
+            module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return module
+
+
+def cpu_device_for(quantize=None):
+    """Dynamic int8 kernels are CPU-only; otherwise let the library pick the device."""
+    return "cpu" if resolve_quantize(quantize) == "int8" else None
+
+
+def inference_mode():
+    return torch.inference_mode()
+
+
+def model_tag(model_name, quantize=None):
+    """Model name plus precision, e.g. for cache keys (int8 vectors differ from fp32)."""
+    mode = resolve_quantize(quantize)
+    return model_name if mode == "none" else f"{model_name}@{mode}"
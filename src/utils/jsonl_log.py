@@ -0,0 +1,226 @@
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import Counter
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still atomic per write, rotation just isn't locked
+    fcntl = None
+
+# LOG_MAX_BYTES        rotate once the file is this big
+# LOG_ROTATE_SECONDS   ...or this old (default: daily)
+# LOG_BACKUPS          rotated files to keep
+# LOG_FLUSH_SECONDS    how often the background thread writes buffered records
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = int(os.getenv("LOG_ROTATE_SECONDS", str(24 * 3600)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "14"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "1.0"))
+
+
+class JsonlLogger:
+    """
+    Append-only JSON-Lines log. log() only puts the record on a queue;
+    a background thread writes whatever has queued up every
+    flush_seconds as one append, so logging costs the same however big the
+    file gets.
+
+    Several processes can share a file: each batch is written with a single
+    O_APPEND write under an flock, and rotation renames the file to
+    `<path>.<timestamp>` under the same lock. Writers notice the rename
+    (inode changed) and reopen.
+    """
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, rotate_seconds=LOG_ROTATE_SECONDS,
+                 backups=LOG_BACKUPS, flush_seconds=LOG_FLUSH_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.flush_seconds = flush_seconds
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._queue = queue.Queue()
+        self._fd = None
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"log-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record):
+        record.setdefault("timestamp", datetime.now().isoformat())
+        self._queue.put(record)
+
+    # ---- writing ----
+    def _open(self):
+        # Closing the old descriptor also drops any flock held on it
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._created = self._created_at()
+
+    def _stale(self):
+        return self._fd is None or os.fstat(self._fd).st_ino != _inode(self.path)
+
+    def _lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _created_at(self):
+        # First record's timestamp, so the age survives restarts
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            return datetime.fromisoformat(json.loads(first)["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError):
+            return time.time()
+
+    def _should_rotate(self):
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            return False
+        return size >= self.max_bytes or time.time() - self._created >= self.rotate_seconds
+
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        os.rename(self.path, f"{self.path}.{stamp}")
+        for old in rotated_files(self.path)[:-self.backups or None]:
+            os.remove(old)
+
+    def flush(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not records:
+            return
+
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+        with self._write_lock:
+            if self._stale():
+                self._open()
+            self._lock()
+            # Another process may have rotated the file while we waited for the lock
+            if self._stale():
+                self._open()
+                self._lock()
+            if self._should_rotate():
+                self._rotate()
+                self._open()
+                self._lock()
+            try:
+                os.write(self._fd, data)
+            finally:
+                self._unlock()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Log write to {self.path} failed: {e}", file=sys.stderr)
+
+    def close(self):
+        # Let an in-progress flush finish before the final one
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        with self._write_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path):
+    """One shared logger (and flush thread) per file per process."""
+    with _loggers_lock:
+        if path not in _loggers:
+            _loggers[path] = JsonlLogger(path)
+        return _loggers[path]
+
+
+# ---- reading ----
+def rotated_files(path):
+    """Rotated files for `path`, oldest first."""
+    return sorted(glob.glob(glob.escape(path) + ".*"))
+
+
+def iter_file(path):
+    """Records from one log file. Also reads the old JSON-array logs."""
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from a crash mid-write
+                continue
+
+
+def read_logs(path, include_rotated=True, since=None, legacy_path=None):
+    """
+    Replay a log in write order: legacy JSON array (if given), rotated
+    files, then the live file. `since` is an ISO timestamp lower bound.
+    """
+    files = [legacy_path] if legacy_path and os.path.exists(legacy_path) else []
+    if include_rotated:
+        files += rotated_files(path)
+    if os.path.exists(path):
+        files.append(path)
+
+    for file in files:
+        for record in iter_file(file):
+            if since and record.get("timestamp", "") < since:
+                continue
+            yield record
+
+
+def summarize_logs(records):
+    """Per-mode request counts and mean confidence."""
+    counts, confidence = Counter(), Counter()
+    for record in records:
+        mode = record.get("mode", "?")
+        counts[mode] += 1
+        confidence[mode] += float(record.get("confidence") or 0.0)
+    return {mode: {"requests": n, "avg_confidence": confidence[mode] / n} for mode, n in counts.items()}
+
+
+if __name__ == "__main__":
+    log_path = sys.argv[1] if len(sys.argv) > 1 else "CHAT-LOGS.jsonl"
+    legacy = os.path.splitext(log_path)[0] + ".json"
+    summary = summarize_logs(read_logs(log_path, legacy_path=legacy))
+    print(f"{'mode':<8} {'requests':>9} {'avg conf':>9}")
+    for mode, s in sorted(summary.items()):
+        print(f"{mode:<8} {s['requests']:>9} {s['avg_confidence']:>9.2f}")
@@ -0,0 +1,43 @@
+import threading
+
+_resources = {}
+_locks = {}
+_guard = threading.Lock()
+
+
+def get_resource(key, factory):
+    """
+    Return the process-wide instance stored under `key`, building it with
+    `factory()` on first use. Each key loads at most once, even when several
+    threads ask for it at the same time.
+    """
+    if key in _resources:
+        return _resources[key]
+
+    with _guard:
+        lock = _locks.setdefault(key, threading.Lock())
+
+    with lock:
+        if key not in _resources:
+            _resources[key] = factory()
+        return _resources[key]
+
+
+def is_loaded(key):
+    return key in _resources
+
+
+def clear_resource(key=None):
+    """
+    Drop one cached resource, or all of them when key is None. Dropped
+    resources with a close() (models with batching threads) are closed.
+    """
+    with _guard:
+        if key is None:
+            dropped = list(_resources.values())
+            _resources.clear()
+        else:
+            dropped = [_resources.pop(key)] if key in _resources else []
+    for resource in dropped:
+        if hasattr(resource, "close"):
+            resource.close()
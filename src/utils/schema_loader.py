@@ -1,23 +1,158 @@
+import os
+import re
 import sqlite3
+import threading
 
+import numpy as np
 
-def load_schema(db_path: str) -> str:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+from src.utils.sql_result_cache import db_version
 
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
+# Prompt limits after pruning; a schema already within them is sent whole
+SCHEMA_MAX_TABLES = int(os.getenv("SCHEMA_MAX_TABLES", "3"))
+SCHEMA_MAX_COLUMNS = int(os.getenv("SCHEMA_MAX_COLUMNS", "12"))
+SAMPLE_VALUES = 3
+# Samples come from the first rows only, so introspection stays cheap on big tables
+SAMPLE_SCAN_ROWS = 1000
+SAMPLE_MAX_CHARS = 30
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _introspect(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        tables = {}
+        for (table_name,) in cursor.fetchall():
+            cursor.execute(f"PRAGMA table_info({_quote(table_name)});")
+            columns = []
+            for col in cursor.fetchall():
+                cursor.execute(
+                    f"SELECT DISTINCT {_quote(col[1])} FROM "
+                    f"(SELECT {_quote(col[1])} FROM {_quote(table_name)} LIMIT {SAMPLE_SCAN_ROWS}) "
+                    f"WHERE {_quote(col[1])} IS NOT NULL LIMIT {SAMPLE_VALUES}"
+                )
+                samples = [str(row[0])[:SAMPLE_MAX_CHARS] for row in cursor.fetchall()]
+                columns.append({"name": col[1], "type": col[2], "samples": samples})
+            tables[table_name] = columns
+        return tables
+    finally:
+        conn.close()
 
-    schema_info = ""
 
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
+def _schema_entry(db_path):
+    """{"version", "tables", "vectors"} for the current database version."""
+    key = os.path.abspath(db_path)
+    version = db_version(db_path)
+    cached = _cache.get(key)
+    if cached and cached["version"] == version:
+        return cached
 
+    with _cache_lock:
+        cached = _cache.get(key)
+        if not cached or cached["version"] != version:
+            cached = {"version": version, "tables": _introspect(db_path), "vectors": {}}
+            _cache[key] = cached
+        return cached
+
+
+def get_schema_info(db_path):
+    """
+    {table: [{"name", "type", "samples"}]} for the database, introspected
+    once per database version (file mtime/size) and cached.
+    """
+    return _schema_entry(db_path)["tables"]
+
+
+def format_schema(tables, with_samples=False):
+    schema_info = ""
+    for table_name, columns in tables.items():
         schema_info += f"\nTable: {table_name}\nColumns:\n"
         for col in columns:
-            schema_info += f"- {col[1]} ({col[2]})\n"
+            line = f"- {col['name']} ({col['type']})"
+            if with_samples and col["samples"]:
+                line += " e.g. " + ", ".join(repr(v) for v in col["samples"])
+            schema_info += line + "\n"
+    return schema_info
+
+
+def load_schema(db_path: str) -> str:
+    """Full schema text (tables, columns, types); cached per database version."""
+    return format_schema(get_schema_info(db_path))
+
+
+def _words(text):
+    # "CustomerId" / "Customer Id" / "customer_ids" -> {"customer", "id"}
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in re.findall(r"[a-z0-9]+", text.lower())}
+
+
+def _keyword_score(question_words, question_lower, table_name, col):
+    score = len(question_words & _words(col["name"]))
+    score += 0.5 * len(question_words & _words(table_name))
+    # A sample value quoted in the question ("customers in Chile") points at its column
+    score += sum(1 for v in col["samples"] if len(v) > 2 and v.lower() in question_lower)
+    return score
+
+
+def _column_vectors(entry, embedder):
+    # Stored on the schema entry the tables came from, so a newer version
+    # introspected meanwhile can't be paired with these tables
+    model = getattr(embedder, "model_name", type(embedder).__name__)
+    if model not in entry["vectors"]:
+        texts = [f"{table_name} {col['name']}" for table_name, columns in entry["tables"].items() for col in columns]
+        vectors = np.asarray(embedder.embed(texts), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        entry["vectors"][model] = vectors
+    return entry["vectors"][model]
+
+
+def prune_schema(question, db_path, embedder=None, max_tables=SCHEMA_MAX_TABLES, max_columns=SCHEMA_MAX_COLUMNS):
+    """
+    Schema text for the prompt: only the tables and columns most relevant
+    to the question (keyword overlap with table/column names and sample
+    values, plus embedding similarity when an embedder is given), each
+    column with a few sample values.
+    """
+    entry = _schema_entry(db_path)
+    tables = entry["tables"]
+    n_columns = sum(len(columns) for columns in tables.values())
+    if len(tables) <= max_tables and all(len(c) <= max_columns for c in tables.values()):
+        return format_schema(tables, with_samples=True)
+
+    question_words = _words(question)
+    question_lower = question.lower()
+    similarity = None
+    if embedder is not None and n_columns:
+        query = np.asarray(embedder.embed([question])[0], dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        similarity = _column_vectors(entry, embedder) @ query
+
+    scored, i = {}, 0
+    for table_name, columns in tables.items():
+        scores = []
+        for col in columns:
+            score = _keyword_score(question_words, question_lower, table_name, col)
+            if similarity is not None:
+                score += float(similarity[i])
+            scores.append(score)
+            i += 1
+        scored[table_name] = scores
 
-    conn.close()
-    return schema_info
\ No newline at end of file
+    # Tables ranked by their best column, then each table's top columns in schema order
+    ranked = sorted(scored, key=lambda t: max(scored[t], default=0.0), reverse=True)
+    # Unrelated tables are left out, unless nothing matched at all
+    relevant = [t for t in ranked if max(scored[t], default=0.0) > 0]
+    ranked = (relevant or ranked)[:max_tables]
+    pruned = {}
+    for table_name in ranked:
+        columns, scores = tables[table_name], scored[table_name]
+        keep = sorted(sorted(range(len(columns)), key=lambda j: scores[j], reverse=True)[:max_columns])
+        pruned[table_name] = [columns[j] for j in keep]
+    return format_schema(pruned, with_samples=True)
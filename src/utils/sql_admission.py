@@ -0,0 +1,244 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from src.utils.sql_executor import get_executor, bounded_sql, TRAILING_LIMIT_RE, SQLTimeoutError
+from src.utils.sql_result_cache import db_version
+
+# SQL_ADMISSION          0 = run every validated query as-is
+# SQL_COST_BUDGET        estimated rows visited a query may cost and still run normally
+# SQL_COST_REJECT        above this the query is refused outright
+# SQL_LOW_PRIORITY_SLOTS over-budget queries allowed to run at the same time
+# SQL_LOW_PRIORITY_WAIT  seconds an over-budget query waits for a slot before it is refused
+# SQL_OVER_BUDGET_ROWS   rows returned by an over-budget query that can stop early ("limit")
+USE_ADMISSION = os.getenv("SQL_ADMISSION", "1") == "1"
+COST_BUDGET = float(os.getenv("SQL_COST_BUDGET", "5000000"))
+COST_REJECT = float(os.getenv("SQL_COST_REJECT", "200000000"))
+LOW_PRIORITY_SLOTS = int(os.getenv("SQL_LOW_PRIORITY_SLOTS", "1"))
+LOW_PRIORITY_WAIT = float(os.getenv("SQL_LOW_PRIORITY_WAIT", "10"))
+OVER_BUDGET_ROWS = int(os.getenv("SQL_OVER_BUDGET_ROWS", "20"))
+
+# Guesses when sqlite_stat1 has nothing for a table / index
+DEFAULT_TABLE_ROWS = 1000
+DEFAULT_MATCH_ROWS = 10
+# SQLite's own rule of thumb: each range bound keeps about a quarter of the rows
+RANGE_SELECTIVITY = 0.25
+
+LOOP_RE = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS (\S+))?(.*)$")
+INDEX_RE = re.compile(r"USING (?:COVERING )?INDEX (\S+)(?: \((.*)\))?")
+AUTO_INDEX_RE = re.compile(r"USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX")
+TABLE_RE = re.compile(r'\b(?:from|join)\s+("[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)(?:\s+(?:as\s+)?(\w+))?', re.IGNORECASE)
+AGGREGATE_RE = re.compile(r"\b(count|sum|avg|min|max|total|group_concat)\s*\(|\bgroup\s+by\b|\bdistinct\b"
+                          r"|\bunion\b|\bexcept\b|\bintersect\b|\bwindow\b|\bover\s*\(", re.IGNORECASE)
+NOT_ALIASES = {"where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+               "group", "order", "limit", "having", "union", "except", "intersect", "window"}
+
+_low_priority = threading.BoundedSemaphore(LOW_PRIORITY_SLOTS)
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+
+class SQLRejectedError(Exception):
+    pass
+
+
+def table_stats(db_path):
+    """
+    {"rows": {table: n}, "indexes": {index: [rows per key prefix, ...]}} from
+    sqlite_stat1 (written by ANALYZE), with max(rowid) as the row count of
+    tables it doesn't cover. Cached per database version.
+    """
+    key = os.path.abspath(db_path)
+    version = db_version(db_path)
+    cached = _stats_cache.get(key)
+    if cached and cached["version"] == version:
+        return cached
+
+    executor = get_executor(db_path)
+    rows, indexes = {}, {}
+    try:
+        _, stat_rows, _ = executor.execute("SELECT tbl, idx, stat FROM sqlite_stat1", max_rows=100_000)
+    except sqlite3.OperationalError:
+        stat_rows = []
+    for table, index, stat in stat_rows:
+        numbers = [int(n) for n in stat.split() if n.isdigit()]
+        if not numbers:
+            continue
+        rows[table.lower()] = max(rows.get(table.lower(), 0), numbers[0])
+        if index:
+            indexes[index.lower()] = numbers[1:]
+
+    _, tables, _ = executor.execute("SELECT name FROM sqlite_master WHERE type = 'table'", max_rows=100_000)
+    for (table,) in tables:
+        if table.lower() not in rows:
+            quoted = '"' + table.replace('"', '""') + '"'
+            try:
+                _, count, _ = executor.execute(f"SELECT max(rowid) FROM {quoted}")
+                rows[table.lower()] = count[0][0] or 0
+            except sqlite3.OperationalError:
+                # WITHOUT ROWID tables
+                rows[table.lower()] = DEFAULT_TABLE_ROWS
+
+    cached = {"version": version, "rows": rows, "indexes": indexes}
+    with _stats_lock:
+        _stats_cache[key] = cached
+    return cached
+
+
+def table_aliases(sql, known_tables):
+    """alias -> table for the FROM / JOIN names in the query (EXPLAIN reports aliases)."""
+    aliases = {}
+    for name, alias in TABLE_RE.findall(sql):
+        table = name.strip('"`[]').lower()
+        if table in known_tables and alias and alias.lower() not in NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _log2(n):
+    return math.log2(n + 1) + 1
+
+
+def _loop_cost(detail, stats, aliases, default_rows):
+    """
+    (cost per pass, rows produced per pass) of one SCAN / SEARCH line of the plan.
+    A SCAN reads the whole table (its WHERE filter can't be seen in the plan,
+    so no reduction is assumed); a SEARCH costs a B-tree descent plus the
+    matching rows, taken from the index statistics when there are some.
+    """
+    match = LOOP_RE.match(detail)
+    name = match.group(2).lower()
+    table = aliases.get(name, name)
+    n = stats["rows"].get(table, default_rows)
+    rest = match.group(4)
+
+    if match.group(1) == "SCAN":
+        return float(n), float(n)
+    if "INTEGER PRIMARY KEY" in rest:
+        return _log2(n), 1.0 if "rowid=?" in rest else max(1.0, n * RANGE_SELECTIVITY)
+    if AUTO_INDEX_RE.search(rest):
+        return _log2(n) + DEFAULT_MATCH_ROWS, float(DEFAULT_MATCH_ROWS)
+
+    index = INDEX_RE.search(rest)
+    terms = (index.group(2) or "") if index else ""
+    n_equal = terms.count("=?")
+    n_range = terms.count(">?") + terms.count("<?")
+    per_key = stats["indexes"].get(index.group(1).lower(), []) if index else []
+    if n_equal and len(per_key) >= n_equal:
+        out = float(per_key[n_equal - 1])
+    elif n_equal:
+        out = float(min(n, DEFAULT_MATCH_ROWS))
+    else:
+        out = float(n)
+    out = max(1.0, out * RANGE_SELECTIVITY ** min(n_range, 2))
+    return _log2(n) + out, out
+
+
+def plan_cost(plan, stats, aliases=None, limit=None):
+    """
+    Estimated rows visited for an EXPLAIN QUERY PLAN tree ((id, parent,
+    detail) rows). Loops at the same level are nested, so their costs
+    multiply (a join of two scans costs rows x rows); temp B-trees add a
+    sort of the rows reaching them (a top-`limit` sort for the outer ORDER
+    BY); correlated subqueries run once per outer row.
+    Returns (cost, estimated output rows).
+    """
+    aliases = aliases or {}
+    children = {}
+    for node_id, parent, detail in plan:
+        children.setdefault(parent, []).append((node_id, detail))
+
+    def nest(parent):
+        cost, rows, last_sub_rows = 0.0, 1.0, None
+        for node_id, detail in children.get(parent, []):
+            if LOOP_RE.match(detail):
+                per_pass, out = _loop_cost(detail, stats, aliases, last_sub_rows or DEFAULT_TABLE_ROWS)
+                cost += rows * per_pass
+                rows *= out
+                if AUTO_INDEX_RE.search(detail):
+                    # The automatic index is built once from the whole table
+                    name = LOOP_RE.match(detail).group(2).lower()
+                    n = stats["rows"].get(aliases.get(name, name), DEFAULT_TABLE_ROWS)
+                    cost += n * _log2(n)
+            elif "TEMP B-TREE" in detail:
+                kept = min(rows, limit) if limit and parent == 0 and "ORDER BY" in detail else rows
+                cost += rows * _log2(kept)
+            else:
+                sub_cost, sub_rows = nest(node_id)
+                if detail.startswith("CORRELATED"):
+                    sub_cost *= rows
+                cost += sub_cost
+                last_sub_rows = sub_rows
+        return cost, rows
+
+    return nest(0)
+
+
+def capped_sql(sql, max_rows):
+    """bounded_sql(), but also lowers an explicit trailing LIMIT above max_rows + 1."""
+    sql = bounded_sql(sql, max_rows)
+    match = TRAILING_LIMIT_RE.search(sql)
+    number = re.match(r"limit\s+(\d+)\s*$", match.group(0), re.IGNORECASE) if match else None
+    if number and int(number.group(1)) > max_rows + 1:
+        sql = sql[:match.start()] + f"LIMIT {max_rows + 1}"
+    return sql
+
+
+def admit(sql, db_path, budget=COST_BUDGET, reject_above=COST_REJECT):
+    """
+    Decide how a validated query may run, before it runs:
+      "run"           estimated cost within budget
+      "limit"         over budget, but its rows stream out (no sort, grouping
+                      or aggregate), so it runs capped at SQL_OVER_BUDGET_ROWS
+                      rows and SQLite stops early
+      "low_priority"  over budget; runs in the low-priority lane
+      "reject"        over SQL_COST_REJECT, or refused by the read-only policy
+    Returns {"action", "sql" (to execute), "max_rows" (row cap, None for the
+    executor's default), "cost", "plan" (EXPLAIN QUERY PLAN rows), "reason"}.
+    """
+    executor = get_executor(db_path)
+    try:
+        plan = executor.plan(sql)
+    except sqlite3.DatabaseError as e:
+        # Authorizer denials ("not authorized") and syntax errors both land here
+        return {"action": "reject", "sql": sql, "max_rows": None, "cost": None, "plan": None,
+                "reason": f"query refused: {e}"}
+    except SQLTimeoutError as e:
+        return {"action": "reject", "sql": sql, "max_rows": None, "cost": None, "plan": None, "reason": str(e)}
+
+    stats = table_stats(db_path)
+    cost, out_rows = plan_cost(plan, stats, table_aliases(sql, stats["rows"]), limit=executor.max_rows + 1)
+    decision = {"action": "run", "sql": sql, "max_rows": None, "cost": cost, "plan": plan,
+                "reason": f"estimated cost {cost:,.0f}"}
+    if cost <= budget:
+        return decision
+
+    # bounded_sql() already caps every query at max_rows, so "limit" only helps with a tighter cap
+    cap = min(OVER_BUDGET_ROWS, executor.max_rows)
+    streams = not AGGREGATE_RE.search(sql) and not any("TEMP B-TREE" in detail for _, _, detail in plan)
+    limited_cost = cost * min(1.0, (cap + 1) / max(out_rows, 1.0))
+    if cost > reject_above:
+        decision.update(action="reject", reason=f"estimated cost {cost:,.0f} is over the limit of {reject_above:,.0f}")
+    elif streams and cap < executor.max_rows and limited_cost <= budget:
+        decision.update(action="limit", sql=capped_sql(sql, cap), max_rows=cap,
+                        reason=f"estimated cost {cost:,.0f}, {limited_cost:,.0f} capped at {cap} rows")
+    else:
+        decision.update(action="low_priority", reason=f"estimated cost {cost:,.0f} is over budget")
+    return decision
+
+
+@contextmanager
+def admission_lane(decision, wait=LOW_PRIORITY_WAIT):
+    """Hold a low-priority slot while an over-budget query runs; other queries pass straight through."""
+    if decision["action"] != "low_priority":
+        yield
+        return
+    if not _low_priority.acquire(timeout=wait):
+        raise SQLRejectedError("Too many expensive queries are running; try again shortly or narrow the question")
+    try:
+        yield
+    finally:
+        _low_priority.release()
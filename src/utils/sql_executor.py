@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from src.utils.resource_cache import get_resource
+
+# SQL_MAX_ROWS        rows any query may return (the rest are never fetched)
+# SQL_TIMEOUT         seconds a query may run before it is interrupted
+# SQL_PAGE_SIZE       rows per page when streaming results
+# SQL_POOL_SIZE       read-only connections kept open per database
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "100"))
+SQL_TIMEOUT = float(os.getenv("SQL_TIMEOUT", "5"))
+SQL_PAGE_SIZE = int(os.getenv("SQL_PAGE_SIZE", "25"))
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "4"))
+
+# Applied to every pooled connection
+PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",   # 256 MB of the file read through the page cache
+    "PRAGMA cache_size = -65536",     # 64 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",     # sorts / GROUP BY temp tables stay in RAM
+)
+
+# Check the clock every this many SQLite VM instructions
+PROGRESS_STEPS = 10_000
+
+TRAILING_LIMIT_RE = re.compile(r"\blimit\s+\d+(\s*(,|offset)\s*\d+)?\s*$", re.IGNORECASE)
+
+
+# Read-only statement policy, checked by SQLite while a statement is prepared
+# (so also by EXPLAIN, before anything runs): plain SELECTs that read tables
+# and call functions. PRAGMA, ATTACH, writes and DDL are all denied.
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+DENIED_FUNCTIONS = {"load_extension", "readfile", "writefile", "edit", "fts3_tokenizer"}
+
+
+class SQLTimeoutError(Exception):
+    pass
+
+
+def read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    if action not in ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+class ConnectionPool:
+    """Fixed-size pool of read-only SQLite connections, opened on demand."""
+    def __init__(self, db_path, size=SQL_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.set_authorizer(read_only_authorizer)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                reserved = self._opened < self.size
+                if reserved:
+                    self._opened += 1
+            if reserved:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    # Give the slot back, or the pool shrinks for good
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def bounded_sql(sql, max_rows):
+    """
+    Append LIMIT max_rows + 1 unless the query already ends in a LIMIT, so
+    SQLite can stop (or use a top-N sort) instead of producing every row.
+    The extra row only tells us the result was cut.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if TRAILING_LIMIT_RE.search(sql):
+        return sql
+    return f"{sql}\nLIMIT {max_rows + 1}"
+
+
+class SQLExecutor:
+    def __init__(self, db_path, pool_size=SQL_POOL_SIZE, max_rows=SQL_MAX_ROWS, timeout=SQL_TIMEOUT):
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.max_rows = max_rows
+        self.timeout = timeout
+
+    @contextmanager
+    def _cursor(self, sql, timeout):
+        deadline = time.monotonic() + timeout
+        with self.pool.connection() as conn:
+            # Returning non-zero from the handler aborts the running statement
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql)
+                yield cursor
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e):
+                    raise SQLTimeoutError(f"Query took longer than {timeout:g}s and was stopped") from None
+                raise
+            finally:
+                cursor.close()
+                conn.set_progress_handler(None, 0)
+
+    def execute(self, sql, max_rows=None, timeout=None):
+        """
+        Run a query and return (columns, rows, truncated). At most max_rows
+        rows are fetched; truncated says whether there were more.
+        """
+        max_rows = max_rows or self.max_rows
+        with self._cursor(bounded_sql(sql, max_rows), timeout or self.timeout) as cursor:
+            columns = [desc[0] for desc in cursor.description or []]
+            rows = cursor.fetchmany(max_rows + 1)
+        return columns, rows[:max_rows], len(rows) > max_rows
+
+    def plan(self, sql, max_rows=None):
+        """EXPLAIN QUERY PLAN (id, parent, detail) rows for the query as execute() would run it."""
+        max_rows = max_rows or self.max_rows
+        with self._cursor("EXPLAIN QUERY PLAN " + bounded_sql(sql, max_rows), self.timeout) as cursor:
+            return [(row[0], row[1], row[3]) for row in cursor.fetchall()]
+
+    def explain(self, sql, max_rows=None):
+        """Just the detail lines of plan()."""
+        return [detail for _, _, detail in self.plan(sql, max_rows)]
+
+    def pages(self, sql, page_size=SQL_PAGE_SIZE, max_rows=None, timeout=None):
+        """
+        Yield (columns, rows) one page at a time, fetched as they are
+        consumed, up to max_rows in total. The timeout covers the whole
+        stream, and the connection is held until the generator is done.
+        """
+        max_rows = max_rows or self.max_rows
+        with self._cursor(bounded_sql(sql, max_rows), timeout or self.timeout) as cursor:
+            columns = [desc[0] for desc in cursor.description or []]
+            sent = 0
+            while sent < max_rows:
+                rows = cursor.fetchmany(min(page_size, max_rows - sent))
+                if not rows:
+                    break
+                sent += len(rows)
+                yield columns, rows
+
+
+def get_executor(db_path):
+    """Shared executor (and connection pool) per database file."""
+    return get_resource(("sql_executor", os.path.abspath(db_path)), lambda: SQLExecutor(db_path))
+
+
+def format_table(columns, rows, max_width=40):
+    """Plain-text table of the rows, each cell cut to max_width characters."""
+    if not rows:
+        return "No results found."
+
+    cells = [[str(c)[:max_width] for c in columns]]
+    cells += [["" if v is None else str(v)[:max_width] for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = [" ".join(cell.rjust(widths[i]) for i, cell in enumerate(row)) for row in cells]
+    return "\n".join(lines)
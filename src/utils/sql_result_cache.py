@@ -0,0 +1,110 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# SQL_RESULT_CACHE      0 = always run the query and the summary
+# SQL_RESULT_CACHE_MB   memory budget for cached rows + summaries
+USE_RESULT_CACHE = os.getenv("SQL_RESULT_CACHE", "1") == "1"
+RESULT_CACHE_MB = float(os.getenv("SQL_RESULT_CACHE_MB", "64"))
+
+# Quoted tokens, kept verbatim: single-quoted strings ('' is an escaped quote),
+# and double-quoted / backtick / bracket identifiers, since SQLite reads
+# "Chile" as a string when no column has that name
+STRING_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`(?:[^`]|``)*`|\[[^\]]*\]")
+
+
+def canonical_sql(sql):
+    """
+    Same text for queries that differ only in case, whitespace or a trailing
+    semicolon. Quoted tokens (strings and quoted identifiers) are left
+    untouched; unquoted keywords and identifiers are case-insensitive in
+    SQLite, so lowercasing the rest is safe.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    parts, last = [], 0
+    for match in STRING_RE.finditer(sql):
+        parts.append(re.sub(r"\s+", " ", sql[last:match.start()].lower()))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(re.sub(r"\s+", " ", sql[last:].lower()))
+    return "".join(parts).strip()
+
+
+def db_version(db_path):
+    """
+    Changes whenever the database file (or its WAL) is written:
+    (mtime_ns, size) of both. Cheaper than opening a connection.
+    """
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def _size_of(value):
+    """Rough in-memory size of rows / strings / dicts, for the budget."""
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size_of(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_of(k) + _size_of(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of query results (rows plus the summaries generated for
+    them), bounded by an approximate memory budget instead of an entry count.
+    """
+    def __init__(self, max_mb=RESULT_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """Insert or replace. Cached values are shared, so put a new value instead of changing one."""
+        size = _size_of(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._bytes += size - self._sizes.get(key, 0)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._data.move_to_end(key)
+            while self._bytes > self.max_bytes:
+                old_key, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def cache_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._data)
+            stats["mb"] = self._bytes / (1024 * 1024)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
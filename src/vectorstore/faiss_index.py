@@ -1,20 +1,314 @@
 import faiss
 import os
+import json
+import time
+import numpy as np
 
-def build_faiss_index(embeddings, save_path):
-    dimension = embeddings.shape[1]
+# flat      exact brute-force L2 (the original behaviour)
+# ivf_flat  inverted lists over k-means cells, full vectors
+# ivf_pq    inverted lists + product-quantized codes (smallest)
+# hnsw      graph index, no training
+# sq8       exact scan over 8-bit scalar-quantized vectors
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
 
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+DEFAULT_PARAMS = {
+    "nlist": None,          # IVF cells; None = ~4*sqrt(n), capped by training size
+    "nprobe": 16,           # IVF cells visited per query
+    "pq_m": 16,             # PQ sub-quantizers (must divide the dimension)
+    "pq_nbits": 8,          # bits per PQ code
+    "hnsw_m": 32,           # HNSW neighbours per node
+    "ef_construction": 200,
+    "ef_search": 64,
+}
 
+# faiss wants roughly this many training points per IVF cell
+MIN_POINTS_PER_CELL = 39
+
+# Vectors are trained on a sample and added in slices, so a memmapped
+# embedding file is never loaded whole
+TRAIN_SAMPLE = 100_000
+ADD_BATCH = 65_536
+
+
+def resolve_params(n_vectors, **params):
+    resolved = dict(DEFAULT_PARAMS)
+    resolved.update({k: v for k, v in params.items() if v is not None})
+
+    max_nlist = max(1, n_vectors // MIN_POINTS_PER_CELL)
+    nlist = resolved["nlist"] or int(4 * np.sqrt(max(n_vectors, 1)))
+    resolved["nlist"] = max(1, min(nlist, max_nlist))
+    resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+    return resolved
+
+
+def create_faiss_index(dimension, index_type="flat", params=None):
+    params = params or resolve_params(0)
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+
+    if index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dimension)
+        return faiss.IndexIVFFlat(quantizer, dimension, params["nlist"], faiss.METRIC_L2)
+
+    if index_type == "ivf_pq":
+        if dimension % params["pq_m"] != 0:
+            raise ValueError(f"pq_m={params['pq_m']} must divide dimension {dimension}")
+        quantizer = faiss.IndexFlatL2(dimension)
+        return faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["pq_m"], params["pq_nbits"])
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+
+    raise ValueError(f"Unknown index type '{index_type}'. Choose from {INDEX_TYPES}")
+
+
+def _base_index(index):
+    # Unwrap IndexIDMap / IndexIDMap2 so search params reach the real index
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    base = _base_index(index)
+    if nprobe is not None and isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    if ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+def index_size_bytes(index):
+    return int(faiss.serialize_index(index).size)
+
+
+def _config_path(index_path):
+    return index_path + ".json"
+
+
+def _training_sample(embeddings, max_rows=TRAIN_SAMPLE):
+    step = max(1, len(embeddings) // max_rows)
+    return np.ascontiguousarray(embeddings[::step][:max_rows], dtype=np.float32)
+
+
+def build_faiss_index(embeddings, save_path, index_type="flat", report=True, ids=None, **params):
+    """
+    With `ids`, the index is keyed by those stable chunk IDs (IVF natively,
+    everything else through IndexIDMap2) so chunks can later be removed or
+    added without a rebuild. Without `ids`, results are row positions.
+    `embeddings` may be a memmap; it is read in slices.
+    """
+    n_vectors, dimension = embeddings.shape
+    params = resolve_params(n_vectors, **params)
+
+    index = create_faiss_index(dimension, index_type, params)
+    if not index.is_trained:
+        sample = _training_sample(embeddings)
+        print(f"Training {index_type} index on {len(sample)} of {n_vectors} vectors...")
+        index.train(sample)
+
+    if ids is not None and not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap2(index)
+    for start in range(0, n_vectors, ADD_BATCH):
+        batch = np.ascontiguousarray(embeddings[start:start + ADD_BATCH], dtype=np.float32)
+        if ids is None:
+            index.add(batch)
+        else:
+            index.add_with_ids(batch, np.asarray(ids[start:start + ADD_BATCH], dtype=np.int64))
+    set_search_params(index, nprobe=params["nprobe"], ef_search=params["ef_search"])
+
+    save_faiss_index(index, save_path, index_type, params)
+
+    if report and index_type != "flat":
+        print_report([evaluate_index(index, embeddings, label=index_type, ids=ids)])
+
+    return index
+
+
+def save_faiss_index(index, save_path, index_type="flat", params=None):
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     faiss.write_index(index, save_path)
+    with open(_config_path(save_path), "w") as f:
+        json.dump({"index_type": index_type, "params": params or resolve_params(index.ntotal)}, f, indent=2)
+
+
+def load_faiss_config(index_path):
+    config_path = _config_path(index_path)
+    if not os.path.exists(config_path):
+        return {"index_type": "flat", "params": resolve_params(0)}
+    with open(config_path, "r") as f:
+        return json.load(f)
+
+
+def is_id_mapped(index):
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def add_to_faiss_index(index, embeddings, ids):
+    for start in range(0, len(ids), ADD_BATCH):
+        batch = np.ascontiguousarray(embeddings[start:start + ADD_BATCH], dtype=np.float32)
+        index.add_with_ids(batch, np.asarray(ids[start:start + ADD_BATCH], dtype=np.int64))
+
+
+def remove_from_faiss_index(index, ids):
+    """Remove vectors by chunk ID. Returns False when the index type can't (HNSW)."""
+    if len(ids) == 0:
+        return True
+    try:
+        index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return True
+    except RuntimeError:
+        return False
 
-    return index
 
 def load_faiss_index(index_path):
-    return faiss.read_index(index_path)
+    index = faiss.read_index(index_path)
+
+    # Search-time knobs live in the sidecar written by build_faiss_index
+    params = load_faiss_config(index_path)["params"]
+    set_search_params(index, nprobe=params.get("nprobe"), ef_search=params.get("ef_search"))
+
+    return index
+
 
 def search_faiss_index(index, query_vector, top_k=5):
     distances, indices = index.search(query_vector, top_k)
-    return distances, indices
\ No newline at end of file
+    return distances, indices
+
+
+def search_faiss_index_filtered(index, query_vectors, top_k, allowed_ids):
+    """Search only among allowed_ids (sorted chunk IDs) with an IDSelector."""
+    selector = faiss.IDSelectorBatch(np.asarray(allowed_ids, dtype=np.int64))
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        # IndexIDMap translates the selector to its internal positions itself
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(np.ascontiguousarray(query_vectors, dtype=np.float32), top_k, params=params)
+
+
+def exact_search_subset(query_vectors, row_ids, vectors, allowed_ids, top_k):
+    """
+    Exact L2 search over just the allowed chunks, reading their rows from
+    the stored vectors (row_ids: chunk ID per row, ascending).
+    Returns (distances, chunk IDs) shaped like index.search.
+    """
+    allowed_ids = np.asarray(allowed_ids, dtype=np.int64)
+    rows = np.searchsorted(row_ids, allowed_ids)
+    inside = rows < len(row_ids)
+    rows, allowed_ids = rows[inside], allowed_ids[inside]
+    # Drop IDs that have no stored vector
+    rows = rows[np.asarray(row_ids[rows]) == allowed_ids]
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+    if len(rows) == 0:
+        empty = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        return np.full(empty.shape, np.inf, dtype=np.float32), empty
+
+    distances, positions = exact_knn(query_vectors, vectors[rows], min(top_k, len(rows)))
+    ids = np.asarray(row_ids[rows])[positions]
+    return distances, ids
+
+
+# ---------------- Recall / latency report ----------------
+def exact_knn(queries, embeddings, k, batch_size=ADD_BATCH):
+    """Exact L2 neighbours (row positions), scanning `embeddings` one slice at a time."""
+    best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_i = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(embeddings), batch_size):
+        batch = np.ascontiguousarray(embeddings[start:start + batch_size], dtype=np.float32)
+        d, i = faiss.knn(queries, batch, min(k, len(batch)))
+        best_d = np.hstack([best_d, d])
+        best_i = np.hstack([best_i, i + start])
+        order = np.argsort(best_d, axis=1, kind="stable")[:, :k]
+        best_d = np.take_along_axis(best_d, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+    return best_d, best_i
+
+
+def evaluate_index(index, embeddings, queries=None, k=10, n_queries=200, label=None, seed=0, ids=None):
+    """
+    Compare `index` against an exact IndexFlatL2 over the same vectors.
+    Queries default to a random sample of the corpus itself. Pass `ids` when
+    the index was built with chunk IDs instead of row positions.
+    """
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False))
+        queries = embeddings[sample]
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, len(embeddings))
+
+    _, truth = exact_knn(queries, embeddings, k)
+    if ids is not None:
+        truth = np.asarray(ids, dtype=np.int64)[truth]
+
+    # One query at a time, as the app searches
+    latencies = []
+    found = np.empty_like(truth)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+
+    hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        "index": label or type(_base_index(index)).__name__,
+        "recall@k": hits / (len(queries) * k),
+        "k": k,
+        "mean_ms": float(latencies_ms.mean()),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "size_mb": index_size_bytes(index) / 1e6,
+    }
+
+
+def print_report(reports):
+    print(f"\n{'index':<10} {'recall@k':>9} {'mean ms':>9} {'p99 ms':>9} {'size MB':>9}")
+    for r in reports:
+        print(
+            f"{r['index']:<10} {r['recall@k']:>9.3f} {r['mean_ms']:>9.3f} "
+            f"{r['p99_ms']:>9.3f} {r['size_mb']:>9.2f}"
+        )
+
+
+def compare_index_types(embeddings, index_types=INDEX_TYPES, k=10, **params):
+    """Build every index type in memory and report recall@k, latency and size."""
+    n_vectors, dimension = embeddings.shape
+    resolved = resolve_params(n_vectors, **params)
+
+    reports = []
+    for index_type in index_types:
+        try:
+            index = create_faiss_index(dimension, index_type, resolved)
+        except ValueError as e:
+            print(f"Skipping {index_type}: {e}")
+            continue
+        if not index.is_trained:
+            index.train(_training_sample(embeddings))
+        for start in range(0, n_vectors, ADD_BATCH):
+            index.add(np.ascontiguousarray(embeddings[start:start + ADD_BATCH], dtype=np.float32))
+        set_search_params(index, nprobe=resolved["nprobe"], ef_search=resolved["ef_search"])
+        reports.append(evaluate_index(index, embeddings, k=k, label=index_type))
+
+    print_report(reports)
+    return reports
+
+
+if __name__ == "__main__":
+    from src.utils.append_store import VectorFile
+
+    _, embeddings = VectorFile("src/data/embeddings/embeddings.f32").load()
+    compare_index_types(embeddings)